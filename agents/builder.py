@@ -1,55 +1,126 @@
-from openai import OpenAI
-
-class ModelBuilder:
-    def __init__(self, client: OpenAI):
-        self.client = client
-
-    def build(self, blueprint_code, stations_table_md, sequence_text, buffers, defects, manual_note = "", sim_time=8*24*3600, warmup_seconds=24*3600, replications = 10):
-        print("\nBuilder activated:")
-        initial_model = self._builder(blueprint_code, stations_table_md, sequence_text, buffers, defects, manual_note, sim_time, warmup_seconds, replications)
-        print("\nInspector activated:")
-        checked_initial_model = self._inspector(initial_model, stations_table_md, sequence_text, buffers, defects, manual_note)
-        return checked_initial_model
-
-    def _builder(self, blueprint_code, stations_table_md, sequence_text, buffers, defects, manual_note, sim_time, warmup_seconds, replications,
-        model = "gpt-5.1"):
-        prompt = (
-            "Please adapt the Python code to represent the following production line. "
-            "Parallel processes split the stream of objects evenly. "
-            "Ensure that the capacities of the buffers (raw and normal) match the input, and that all (helper) buffers have a defined capacity.\n\n"
-            f"```python\n{blueprint_code}\n```\n\n"
-            f"Stations table:\n\n{stations_table_md}\n\n"
-            f"Buffer list with their capacity and process time:\n\n{buffers}\n\n"
-            f"Direct-follow relationships:\n\n{sequence_text}\n\n"
-            f"Defects:\n\n{defects}\n\n"
-            f"{manual_note}\n\n"
-            f"Simulation time: {sim_time}\n\n"
-            f"Warm-up period: {warmup_seconds}\n\n"
-            f"Replications: {replications}\n\n"
-            "Only answer with the code.")
-        resp = self.client.chat.completions.create(
-            model=model, messages=[{"role": "user", "content": prompt}])
-        try:
-            return resp.choices[0].message.content
-        except Exception as e:
-            raise RuntimeError(f"No completion was returned: {e}")
-
-    def _inspector(self, initial_code, stations_table_md, sequence_text, buffers, defects, manual_note,
-        model: str = "gpt-5.1"):
-        prompt = (
-            "Please check that the following Python code represents the following production line. "
-            "Please check that handoff channels or other storage elements have defined capacity values, except for sinks or sources."
-            "Parallel processes split the stream of objects evenly.\n\n"
-            f"```python\n{initial_code}\n```\n\n"
-            f"Stations table:\n\n{stations_table_md}\n\n"
-            f"Buffer list with their capacity and process time:\n\n{buffers}\n\n"
-            f"Direct-follow relationships:\n\n{sequence_text}\n\n"
-            f"Defects:\n\n{defects}\n\n"
-            f"{manual_note}\n\n"
-            "If it is correct, do nothing. If it is incorrect, please adapt it so that it runs correctly. Only answer with the code.\n\n")
-        resp = self.client.chat.completions.create(
-            model=model, messages=[{"role": "user", "content": prompt}])
-        try:
-            return resp.choices[0].message.content
-        except Exception as e:
+from typing import TYPE_CHECKING
+import json
+from helpers.llm_cache import uncached
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+class ModelBuilder:
+    def __init__(self, client: "OpenAI", use_cache: bool = True):
+        self.client = client if use_cache else uncached(client)
+
+    def build(self, blueprint_code, stations_table_md, sequence_text, buffers, defects, manual_note = "", sim_time=8*24*3600, warmup_seconds=24*3600, replications = 10,
+              stop_windows=None):
+        print("\nBuilder activated:")
+        note = " ".join(filter(None, (manual_note, self._schedule_note(stop_windows))))
+        initial_model = self._builder(blueprint_code, stations_table_md, sequence_text, buffers, defects, note, sim_time, warmup_seconds, replications)
+        print("\nInspector activated:")
+        checked_initial_model = self._inspector(initial_model, stations_table_md, sequence_text, buffers, defects, note)
+        return checked_initial_model
+
+    def build_spec(self, stations_table_md, sequence_text, buffers, defects, manual_note = "", sim_time=8*24*3600, warmup_seconds=24*3600, replications = 10,
+                   stop_windows=None, attempts=2):
+        """
+        Let the LLM describe the line as a topology spec instead of writing the model code.
+
+        The spec is validated and compiled into a short model program (see
+        blueprint/topology.py); a spec that fails validation is sent back once
+        with the error. Returns the program source.
+        """
+        from blueprint import topology
+        print("\nSpec builder activated:")
+        answer, error = None, None
+        for _ in range(attempts):
+            answer = self._spec_builder(topology.EXAMPLE_SPEC, stations_table_md, sequence_text, buffers, defects, manual_note,
+                                        sim_time, warmup_seconds, replications, stop_windows, answer, error)
+            # validate raises ValueError (json.JSONDecodeError is one as well); the others would be
+            # a spec shape it does not anticipate, which the LLM gets to fix all the same
+            try:
+                return topology.to_program(json.loads(answer))
+            except (ValueError, TypeError, KeyError, AttributeError) as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Invalid spec: {error}")
+        raise RuntimeError(f"No valid topology spec after {attempts} attempts: {error}")
+
+    def _spec_builder(self, example_spec, stations_table_md, sequence_text, buffers, defects, manual_note, sim_time, warmup_seconds,
+                      replications, stop_windows, previous_answer=None, error=None,
+        model = "gpt-5.1",
+        response_format={"type": "json_object"}):
+        prompt = (
+            "Please describe the following production line as a JSON topology spec in the format of this example. "
+            "Machines read from one input buffer and write to one output buffer or sink; buffers with a 'delay' are "
+            "conveyors whose capacity includes parts in transit, buffers without one are plain queues. "
+            "Parallel machines get their own input and output buffers, a splitter that splits the stream of objects evenly "
+            "(policy round_robin, shortest_queue or first_free) and a merger. Use the stations table for process times, availability, MTTR and power "
+            "(kW, working and waiting), and give every buffer a capacity.\n\n"
+            f"```json\n{json.dumps(example_spec, indent=1)}\n```\n\n"
+            f"Stations table:\n\n{stations_table_md}\n\n"
+            f"Buffer list with their capacity and process time:\n\n{buffers}\n\n"
+            f"Direct-follow relationships:\n\n{sequence_text}\n\n"
+            f"Defects:\n\n{defects}\n\n"
+            f"{manual_note}\n\n"
+            f"Production stop windows (stop_windows): {list(stop_windows or [])!r}\n\n"
+            f"Simulation time (sim_time): {sim_time}\n\n"
+            f"Warm-up period (warmup): {warmup_seconds}\n\n"
+            f"Replications: {replications}\n\n")
+        if error:
+            prompt += f"Your previous spec was rejected:\n\n{previous_answer}\n\nError: {error}\n\n"
+        prompt += "Only answer with the JSON spec."
+        resp = self.client.chat.completions.create(
+            model=model, response_format=response_format, messages=[{"role": "user", "content": prompt}])
+        try:
+            return resp.choices[0].message.content
+        except Exception as e:
+            raise RuntimeError(f"No completion was returned: {e}")
+
+    @staticmethod
+    def _schedule_note(stop_windows):
+        # declarative stop windows go into the blueprint's calendar, so the model does not hand-code them
+        if not stop_windows:
+            return ""
+        return (f"Production stop windows: set PRODUCTION_CALENDAR = ShiftCalendar({list(stop_windows)!r}) "
+                "and pass it to every Machine as calendar; do not write schedule logic.")
+
+    def _builder(self, blueprint_code, stations_table_md, sequence_text, buffers, defects, manual_note, sim_time, warmup_seconds, replications,
+        model = "gpt-5.1"):
+        prompt = (
+            "Please adapt the Python code to represent the following production line. "
+            "Parallel processes split the stream of objects evenly. "
+            "Ensure that the capacities of the buffers (raw and normal) match the input, and that all (helper) buffers have a defined capacity. "
+            "Keep importing the building blocks from blueprint.des_lib instead of defining them in the model.\n\n"
+            f"```python\n{blueprint_code}\n```\n\n"
+            f"Stations table:\n\n{stations_table_md}\n\n"
+            f"Buffer list with their capacity and process time:\n\n{buffers}\n\n"
+            f"Direct-follow relationships:\n\n{sequence_text}\n\n"
+            f"Defects:\n\n{defects}\n\n"
+            f"{manual_note}\n\n"
+            f"Simulation time: {sim_time}\n\n"
+            f"Warm-up period: {warmup_seconds}\n\n"
+            f"Replications: {replications}\n\n"
+            "Only answer with the code.")
+        resp = self.client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}])
+        try:
+            return resp.choices[0].message.content
+        except Exception as e:
+            raise RuntimeError(f"No completion was returned: {e}")
+
+    def _inspector(self, initial_code, stations_table_md, sequence_text, buffers, defects, manual_note,
+        model: str = "gpt-5.1"):
+        prompt = (
+            "Please check that the following Python code represents the following production line. "
+            "Please check that handoff channels or other storage elements have defined capacity values, except for sinks or sources."
+            "Parallel processes split the stream of objects evenly.\n\n"
+            f"```python\n{initial_code}\n```\n\n"
+            f"Stations table:\n\n{stations_table_md}\n\n"
+            f"Buffer list with their capacity and process time:\n\n{buffers}\n\n"
+            f"Direct-follow relationships:\n\n{sequence_text}\n\n"
+            f"Defects:\n\n{defects}\n\n"
+            f"{manual_note}\n\n"
+            "If it is correct, do nothing. If it is incorrect, please adapt it so that it runs correctly. Only answer with the code.\n\n")
+        resp = self.client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}])
+        try:
+            return resp.choices[0].message.content
+        except Exception as e:
             raise RuntimeError(f"No completion was returned: {e}")
\ No newline at end of file
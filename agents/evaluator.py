@@ -1,21 +1,26 @@
-from openai import OpenAI
-from helpers.other_helpers import retrieve_KPIs
-
-class Evaluater:
-    def __init__(self, client: OpenAI):
-        self.client = client
-
-    def evaluate(self, results):
-        print("\nEvaluator activated:")
-        # Need to flatten the nested list
-        flat = [line for sub in results for line in sub]
-        return self._evaluator(flat)
-
-    def _evaluator(self, results,
-        model = "gpt-5-mini"): 
-        prompt = (
-            f"Here are the results of the original code and the modified code execution:\n\n```\n{results}\n```\n\n"
-            "Please go through the different configurations and summarize the best one.")
-        resp = self.client.chat.completions.create(
-            model=model, messages=[{"role": "user", "content": prompt}])
+from typing import TYPE_CHECKING
+import json
+from helpers.llm_cache import uncached
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+class Evaluater:
+    def __init__(self, client: "OpenAI", use_cache: bool = True):
+        self.client = client if use_cache else uncached(client)
+
+    def evaluate(self, results):
+        print("\nEvaluator activated:")
+        # Only the aggregated KPIs per model, not every replication
+        summaries = [{key: kpis[key] for key in ("model", "runs", "summary", "bottleneck_frequency")}
+                     for kpis in results]
+        return self._evaluator(json.dumps(summaries, indent=2))
+
+    def _evaluator(self, results,
+        model = "gpt-5-mini"): 
+        prompt = (
+            f"Here are the results of the original code and the modified code execution:\n\n```\n{results}\n```\n\n"
+            "Please go through the different configurations and summarize the best one.")
+        resp = self.client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}])
         return resp.choices[0].message.content
\ No newline at end of file
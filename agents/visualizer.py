@@ -1,8 +1,12 @@
-from openai import OpenAI
+from typing import TYPE_CHECKING
+from helpers.llm_cache import uncached
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 class Modelvisualizer:
-    def __init__(self, client: OpenAI):
-        self.client = client
+    def __init__(self, client: "OpenAI", use_cache: bool = True):
+        self.client = client if use_cache else uncached(client)
 
     def visualize_agent(self, model_source: str) -> str:
         print("\nVisualizer activated:")
@@ -0,0 +1,78 @@
+"""
+Check and time the simulation backends of blueprint/topology.py.
+
+    python benchmarks/bench_kernels.py
+    python benchmarks/bench_kernels.py --spec line.json --seeds 1 2 3 --days 30
+
+Every seed is simulated by the compiled line on the heapq and the SimPy
+event calendar and, for the built-in example line, by the blueprint's own
+run_simulation (SimPy processes). The KPIs of each replication must agree
+up to floating-point rounding; the script exits with status 1 if any
+differ.
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from blueprint import blueprint_util as bp
+from blueprint import des_lib as lib
+from blueprint import topology
+
+def kpis(result):
+    """Flat {name: value} of the KPIs that have to agree between backends."""
+    values = {"throughput": result["overall"]["throughput"], "wip": result["overall"]["wip"],
+              "wip_std": result["overall"]["wip_std"], "energy_per_part": lib.energy_per_part(result)}
+    for name, data in result["bottleneck"]["all"].items():
+        values[f"{name} processed"] = data["processed_count"]
+        values[f"{name} working_time"] = result["machine_energy"][name]["working_time"]
+        values[f"{name} total_energy"] = result["machine_energy"][name]["total_energy"]
+    return values
+
+def differences(reference, other, rel_tol=1e-9):
+    return [f"{key}: {reference[key]!r} != {other.get(key)!r}" for key in reference
+            if key not in other or not math.isclose(reference[key], other[key], rel_tol=rel_tol, abs_tol=1e-9)]
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spec", type=Path, help="JSON topology spec (default: the blueprint's example line)")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[11, 12, 13, 14, 15])
+    parser.add_argument("--days", type=float, default=6, help="simulated days per replication, warm-up included")
+    args = parser.parse_args()
+
+    spec = json.loads(args.spec.read_text(encoding="utf-8")) if args.spec else dict(topology.EXAMPLE_SPEC)
+    spec = topology.validate({**spec, "sim_time": args.days * lib.SEC_PER_DAY, "measure_until": args.days * lib.SEC_PER_DAY})
+    backends = {"heap": lambda seed: topology.simulate(spec, seed, "heap"),
+                "simpy": lambda seed: topology.simulate(spec, seed, "simpy")}
+    if not args.spec:
+        backends["blueprint"] = lambda seed: bp.run_simulation(seed, spec["warmup"], spec["measure_until"])
+
+    print(f"{'seed':>6} " + " ".join(f"{name + ' s':>12}" for name in backends) + "  same KPIs")
+    totals = dict.fromkeys(backends, 0.0)
+    failed = False
+    for seed in args.seeds:
+        times, results = {}, {}
+        for name, run in backends.items():
+            times[name], result = _timed(lambda: run(seed))
+            results[name] = kpis(result)
+            totals[name] += times[name]
+        diffs = [f"{name}: {diff}" for name in backends if name != "heap"
+                 for diff in differences(results["heap"], results[name])]
+        failed = failed or bool(diffs)
+        print(f"{seed:>6} " + " ".join(f"{times[name]:>12.3f}" for name in backends) + f"  {not diffs}")
+        for diff in diffs:
+            print(f"       {diff}")
+    print("speedup of heap: " + ", ".join(f"{totals[name] / totals['heap']:.1f}x vs {name}"
+                                          for name in backends if name != "heap"))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
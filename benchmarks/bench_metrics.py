@@ -0,0 +1,106 @@
+"""
+Benchmark processmining.metrics.compute against the previous implementation
+on synthetic event logs.
+
+    python benchmarks/bench_metrics.py --sizes 10000 100000 1000000 10000000 50000000
+
+The reference implementation is only run up to --reference-max rows, since
+it copies the frame several times; where both run, the tables are checked
+for equality.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from processmining import metrics
+
+# sorted, so categorical and string columns give the same row order
+MACHINES = sorted(["Loading robot", "Conveyor belt", "Washing machine", "Hantering cell",
+                   "Presses cell 1", "Presses cell 2", "Quality station cell"])
+REASON_CODES = sorted(["Working", "Idle", "Warning", "Stopped", "Idle for Deviation"])
+REASON_SHARES = {"Working": 0.5, "Idle": 0.3, "Warning": 0.05, "Stopped": 0.1, "Idle for Deviation": 0.05}
+
+def synthetic_log(rows: int, seed: int = 0):
+    """Event log with the input data contract's columns and realistic proportions."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2023-02-27 08:00:00") + pd.to_timedelta(np.sort(rng.integers(0, rows * 10, rows)), unit="s")
+    duration = pd.to_timedelta(rng.integers(1, 600, rows), unit="s")
+    return pd.DataFrame({
+        "ID": rng.integers(0, max(1, rows // 20), rows),
+        "MachineName": pd.Categorical.from_codes(rng.integers(0, len(MACHINES), rows), MACHINES),
+        "StartTime": start,
+        "EndTime": start + duration,
+        "ReasonCode": pd.Categorical.from_codes(rng.choice(len(REASON_CODES), rows, p=[REASON_SHARES[c] for c in REASON_CODES]),
+                                                REASON_CODES),
+        "EnergyConsumption": rng.random(rows) * 100,
+    })
+
+def compute_reference(df: pd.DataFrame):
+    # metrics.compute before the single-pass rewrite
+    df = df.copy()
+
+    df["ProcessTime"] = df["EndTime"] - df["StartTime"]
+    produced_parts = df["ID"].nunique()
+
+    running = df[df["ReasonCode"].isin(["Working", "Warning"])]
+    running_sec = running.groupby("MachineName", observed=True)["ProcessTime"].sum().dt.total_seconds()
+    avg_time_per_part = (running_sec/produced_parts).rename("Avg_Time_per_part_s")
+
+    grouped = (df.groupby(["MachineName", "ReasonCode"], observed=True)["ProcessTime"].sum().unstack(fill_value=pd.Timedelta(0)))
+    for col in grouped.columns:
+        grouped[col] = grouped[col].dt.total_seconds()
+
+    available = grouped.get("Working", 0) + grouped.get("Idle", 0) + grouped.get("Warning", 0)
+    grouped["Availability_%"] = available / grouped.sum(axis=1) * 100
+    availability_pct = grouped["Availability_%"]
+
+    stopped = df[df["ReasonCode"] == "Stopped"]
+    mttr = (stopped.groupby("MachineName", observed=True)["ProcessTime"].mean().dt.total_seconds().reindex(grouped.index)).rename("MTTR_s")
+    mttr[mttr.isna() & (availability_pct == 100)] = 1.0
+
+    keep = df[df["ReasonCode"].isin(["Working", "Idle", "Idle for Deviation", "Warning"])].copy()
+    keep["Category"] = keep["ReasonCode"].map(lambda x: "EnergyWorking" if x in ("Working", "Warning") else "EnergyIdling")
+    energy = (keep.groupby(["MachineName", "Category"], observed=True).agg({"EnergyConsumption": "sum", "ProcessTime": "sum"}))
+    energy["s"] = energy["ProcessTime"].dt.total_seconds()
+    energy["kJ_per_s"] = energy["EnergyConsumption"] / energy["s"]
+    energy = energy["kJ_per_s"].unstack(fill_value=0)
+
+    final = (pd.concat([avg_time_per_part, grouped["Availability_%"], mttr, energy], axis=1).reset_index().rename(columns={"index": "MachineName"}))
+    numeric_cols = final.select_dtypes(include="number").columns
+    final[numeric_cols] = final[numeric_cols].round(2)
+    return final
+
+def _timed(func, df, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument("--reference-max", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'reference s':>12} {'compute s':>10} {'speedup':>8}  same table")
+    for rows in args.sizes:
+        df = synthetic_log(rows)
+        new_s, new_table = _timed(metrics.compute, df, args.repeat)
+        if rows <= args.reference_max:
+            ref_s, ref_table = _timed(compute_reference, df, args.repeat)
+            same = ref_table.to_string() == new_table.to_string()
+            print(f"{rows:>12,} {ref_s:>12.3f} {new_s:>10.3f} {ref_s / new_s:>7.1f}x  {same}")
+        else:
+            print(f"{rows:>12,} {'-':>12} {new_s:>10.3f} {'-':>8}  -")
+        del df
+
+if __name__ == "__main__":
+    main()
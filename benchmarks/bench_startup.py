@@ -0,0 +1,73 @@
+"""
+Benchmark cold import time of the pipeline's modules.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --modules main helpers.other_helpers --top 10
+
+Each module is imported in a fresh interpreter with -X importtime, so
+nothing is cached between measurements. main is imported in replay mode,
+which needs no API key. For every module the cumulative import time and
+its heaviest third-party imports are reported (best of --repeat runs).
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+MODULES = ["main", "processmining.eventlog", "processmining.metrics", "processmining.incremental",
+           "helpers.other_helpers", "helpers.runner", "agents.builder", "agents.adapter"]
+# own packages, left out of the third-party breakdown
+OWN = ("main", "processmining", "helpers", "agents", "blueprint", "benchmarks")
+
+def _third_party(name: str):
+    package = name.split(".")[0]
+    return package not in OWN and package not in sys.stdlib_module_names
+
+def import_times(module: str):
+    """
+    Cumulative microseconds of one cold import of module, and of the
+    third-party packages it pulls in that are not imported by another
+    third-party package.
+    """
+    env = {**os.environ, "LLM_CACHE_MODE": "replay", "PYTHONDONTWRITEBYTECODE": "1"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative)))
+    # -X importtime lists a module after everything it imports: walk backwards to see parents first
+    total, packages, parents = 0, {}, []
+    for depth, name, cumulative in reversed(entries):
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        if name == module:
+            total = cumulative
+        elif "." not in name and _third_party(name) and not any(_third_party(p) for _, p in parents):
+            packages[name] = cumulative
+        parents.append((depth, name))
+    return total, packages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="third-party imports listed per module")
+    args = parser.parse_args()
+
+    print(f"{'module':<28} {'import s':>9}  heaviest third-party imports")
+    for module in args.modules:
+        total, packages = min((import_times(module) for _ in range(args.repeat)), key=lambda run: run[0])
+        # sub-millisecond entries are interpreter startup hooks (sitecustomize, ...)
+        heaviest = sorted(((name, t) for name, t in packages.items() if t >= 1000),
+                          key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{module:<28} {total / 1e6:>9.3f}  " + ", ".join(f"{name} {t / 1e6:.2f}" for name, t in heaviest))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Check and time the sweep table of helpers/sweep.py.
+
+    python benchmarks/bench_sweep.py
+    python benchmarks/bench_sweep.py --days 4 --seeds 1 2
+
+Runs three sweeps over different parameters of the example topology into
+the same CSV table (as repeated runs with the default --out do), then
+reloads the table and compares every row with the KPIs the sweeps
+returned. Exits with status 1 if a row is missing or differs.
+"""
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from blueprint import des_lib as lib
+from blueprint import topology
+from helpers.comparison import KPIS
+from helpers.sweep import Sweep, apply_parameters, grid, latin_hypercube
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--days", type=float, default=3, help="simulated days per replication, warm-up included")
+    args = parser.parse_args()
+
+    sim_time = args.days * lib.SEC_PER_DAY
+    code = apply_parameters(topology.to_program(topology.EXAMPLE_SPEC), {"sim_time": sim_time, "measure_until": sim_time})
+    designs = [grid({"buffer1.capacity": [1, 3]}),
+               grid({"M2.process_time": [18, 22], "buffer1.capacity": [2]}),
+               latin_hypercube({"M5.mttr": (60, 120)}, 2, seed=0)]
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = Path(tmp) / "sweep.csv"
+        expected = {}
+        start = time.perf_counter()
+        for points in designs:
+            sweep = Sweep(code, out_path, seeds=args.seeds)
+            for point, row in zip(points, sweep.run(points, progress=False)):
+                expected[sweep._key(point)] = row
+        elapsed = time.perf_counter() - start
+        reloaded = Sweep(code, out_path).rows
+        print(out_path.read_text(encoding="utf-8"))
+
+    failed = False
+    for key, row in expected.items():
+        if key not in reloaded:
+            print(f"missing: {dict(key)}")
+            failed = True
+            continue
+        diffs = [f"{kpi}: {row[kpi]!r} != {reloaded[key][kpi]!r}" for kpi in KPIS
+                 if not math.isclose(row[kpi], reloaded[key][kpi], rel_tol=1e-12)]
+        for diff in diffs:
+            print(f"{dict(key)} {diff}")
+        failed = failed or bool(diffs)
+    print(f"{len(expected)} configurations in {elapsed:.1f} s, table {'differs' if failed else 'matches'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
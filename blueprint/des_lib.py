@@ -0,0 +1,818 @@
+"""
+Building blocks of the blueprint model (blueprint/blueprint_util.py).
+
+Generated models import their components from here and only define the
+line itself (run_simulation and the run settings):
+
+- ShiftCalendar: weekly stop windows
+- RandomStreams: one random stream per machine, for common random numbers
+- DelayBuffer, CountingSink, Part, Machine: the SimPy line elements
+- Splitter, Merger: N-way routing without a process per part
+- WipTracker: exact time-weighted WIP
+- run_replications, run_adaptive_replications, report, run_and_report:
+  replications over seeds, precision-based stopping and the KPI report
+  and result document the pipeline reads
+
+The DES_* environment the runner sets (seeds, result file, workers,
+adaptive stopping) is read when run_and_report is called rather than on
+import, as this module stays imported in warm runner workers.
+"""
+import bisect
+import functools
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import statistics
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import simpy
+
+SEC_PER_DAY = 86400
+SEC_PER_WEEK = 7 * SEC_PER_DAY
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")   # day 0 of the simulation is a Monday
+
+class ShiftCalendar:
+    """
+    Weekly production calendar built once from declarative stop windows.
+
+    Windows are strings, either spanning days ("Fri 17:00-Sat 07:00") or
+    repeated on a range of days ("Mon-Fri 16:00-24:00"; an end before the
+    start runs into the next day). They are merged into a sorted table of
+    closed intervals of the week, which is searched with bisect, so
+    wait_time and next_close cost O(log n).
+    """
+    _SPAN = re.compile(r"^(\w{3})\s+(\d{1,2}):(\d{2})\s*-\s*(\w{3})\s+(\d{1,2}):(\d{2})$")
+    _DAILY = re.compile(r"^(\w{3})(?:\s*-\s*(\w{3}))?\s+(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$")
+
+    def __init__(self, stop_windows=()):
+        intervals = []
+        for window in stop_windows:
+            for start, end in self._parse(window.strip()):
+                # split windows that wrap past the end of the week
+                if end <= SEC_PER_WEEK:
+                    intervals.append((start, end))
+                else:
+                    intervals += [(start, SEC_PER_WEEK), (0, end - SEC_PER_WEEK)]
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.closed = [tuple(iv) for iv in merged]
+        self._starts = [start for start, _ in self.closed]
+        self.always_closed = self.closed == [(0, SEC_PER_WEEK)]
+
+    @classmethod
+    def _day(cls, name):
+        try:
+            return DAYS.index(name[:3].capitalize())
+        except ValueError:
+            raise ValueError(f"Unknown weekday {name!r}, expected one of {DAYS}")
+
+    @classmethod
+    def _parse(cls, window):
+        span = cls._SPAN.match(window)
+        if span:
+            d1, h1, m1, d2, h2, m2 = span.groups()
+            start = cls._day(d1) * SEC_PER_DAY + int(h1) * 3600 + int(m1) * 60
+            end = cls._day(d2) * SEC_PER_DAY + int(h2) * 3600 + int(m2) * 60
+            return [(start, end if end > start else end + SEC_PER_WEEK)]
+        daily = cls._DAILY.match(window)
+        if daily:
+            d1, d2, h1, m1, h2, m2 = daily.groups()
+            first, last = cls._day(d1), cls._day(d2 or d1)
+            begin, finish = int(h1) * 3600 + int(m1) * 60, int(h2) * 3600 + int(m2) * 60
+            if finish <= begin:
+                finish += SEC_PER_DAY
+            days = range(first, (last if last >= first else last + 7) + 1)
+            return [(d % 7 * SEC_PER_DAY + begin, d % 7 * SEC_PER_DAY + finish) for d in days]
+        raise ValueError(f"Cannot parse stop window {window!r}, expected e.g. 'Fri 17:00-Sat 07:00' or 'Mon-Fri 16:00-24:00'")
+
+    def _closed_interval(self, t):
+        # index of the closed interval containing week time t, or None
+        i = bisect.bisect_right(self._starts, t) - 1
+        return i if i >= 0 and t < self.closed[i][1] else None
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until production is allowed again (0.0 while open)."""
+        if self.always_closed:
+            return float("inf")
+        t = now % SEC_PER_WEEK
+        i = self._closed_interval(t)
+        if i is None:
+            return 0.0
+        wait = self.closed[i][1] - t
+        # a window reaching the end of the week continues in the one starting on Monday 00:00
+        if self.closed[i][1] == SEC_PER_WEEK and self.closed[0][0] == 0 and i != 0:
+            wait += self.closed[0][1]
+        return wait
+
+    def next_close(self, now: float) -> float:
+        """Absolute time at which the next stop window begins (now if already closed)."""
+        if not self.closed:
+            return float("inf")
+        t = now % SEC_PER_WEEK
+        if self._closed_interval(t) is not None:
+            return now
+        i = bisect.bisect_right(self._starts, t)
+        week_start = now - t
+        if i < len(self._starts):
+            return week_start + self._starts[i]
+        return week_start + SEC_PER_WEEK + self._starts[0]
+
+class RandomStream:
+    """
+    Random draws of one machine, pre-generated in blocks by numpy Generators.
+
+    Offers the random.random / random.expovariate interface that Machine
+    uses. Uniform and exponential draws come from separate generators, so
+    e.g. defect decisions do not shift the breakdown sequence.
+    """
+    def __init__(self, seed_sequence, block=4096):
+        uniform_seq, exponential_seq = seed_sequence.spawn(2)
+        self._uniform_rng = np.random.default_rng(uniform_seq)
+        self._exponential_rng = np.random.default_rng(exponential_seq)
+        self.block = block
+        self._uniform, self._u = [], 0
+        self._exponential, self._e = [], 0
+
+    def random(self):
+        if self._u == len(self._uniform):
+            self._uniform, self._u = self._uniform_rng.random(self.block).tolist(), 0
+        self._u += 1
+        return self._uniform[self._u - 1]
+
+    def expovariate(self, lambd):
+        if self._e == len(self._exponential):
+            self._exponential, self._e = self._exponential_rng.standard_exponential(self.block).tolist(), 0
+        self._e += 1
+        return self._exponential[self._e - 1] / lambd
+
+class RandomStreams:
+    """
+    Independent RandomStreams per machine, keyed by (seed, machine name).
+
+    A machine's draws depend only on the seed and its own name, so they stay
+    the same when other machines are added, removed or renamed, and two
+    model variants run with the same seed share common random numbers.
+    """
+    def __init__(self, seed, block=4096):
+        self.seed = seed
+        self.block = block
+
+    def stream(self, name):
+        key = int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "little")
+        return RandomStream(np.random.SeedSequence(self.seed, spawn_key=(key,)), self.block)
+
+def _free_slots(buf):
+    # free-slot count of a DelayBuffer, MergeInlet, CountingSink or plain Store, looked up once
+    return getattr(buf, "free_capacity", None) or (lambda: buf.capacity - len(buf.items))
+
+class Splitter:
+    """
+    Routes the parts of one input to N outputs without a process per part.
+
+    Policies:
+    - "round_robin": the next output in turn that has a free slot; the turn then passes to
+      the output after the one that took the part, so a full output that was skipped
+      gets its next part only when the rotation comes round to it again
+    - "shortest_queue": the output with the most free slots
+    - "first_free": the first output in list order that has a free slot
+    If every output is full, the part waits for the output whose turn it is.
+    A part is only taken from the input once the previous one has been
+    handed over (including a DelayBuffer's transit). routed counts the parts
+    sent to each output since the last reset_stats().
+    """
+    POLICIES = ("round_robin", "shortest_queue", "first_free")
+
+    def __init__(self, env, name, input_buffer, outputs, policy="round_robin", labels=None):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown splitter policy {policy!r}, expected one of {self.POLICIES}")
+        self.env = env
+        self.name = name
+        self.input_buffer = input_buffer
+        self.outputs = list(outputs)
+        self.labels = list(labels) if labels else [f"{name}[{i}]" for i in range(len(self.outputs))]
+        self.policy = policy
+        self._free = [_free_slots(out) for out in self.outputs]
+        self._turn = 0
+        self.routed = [0] * len(self.outputs)
+        self._take()
+
+    def _take(self, _=None):
+        self.input_buffer.get().callbacks.append(self._route)
+
+    def _choose(self):
+        n, free = len(self.outputs), self._free
+        if self.policy == "first_free":
+            return next((i for i in range(n) if free[i]() > 0), self._turn)
+        if self.policy == "shortest_queue":
+            best = max(range(n), key=lambda i: free[i]())
+            return best if free[best]() > 0 else self._turn
+        return next((i % n for i in range(self._turn, self._turn + n) if free[i % n]() > 0), self._turn)
+
+    def _route(self, get_event):
+        i = self._choose()
+        self._turn = (i + 1) % len(self.outputs)
+        self.routed[i] += 1
+        self.outputs[i].put(get_event.value).callbacks.append(self._take)
+
+    def reset_stats(self):
+        self.routed = [0] * len(self.outputs)
+
+    def stats(self):
+        return {"policy": self.policy, "counts": dict(zip(self.labels, self.routed))}
+
+class MergeInlet:
+    """One input of a Merger; machines put into it like into a Store of the given capacity."""
+    def __init__(self, merger, index, capacity):
+        self.merger = merger
+        self.index = index
+        self.capacity = capacity
+        self.items = deque()
+        self._put_queue = deque()   # (part, event) waiting for space
+        self.busy = False           # a part of this inlet is being handed to the output
+        self.delivered = self._delivered
+
+    def put(self, part):
+        event = self.merger.env.event()
+        if len(self.items) < self.capacity:
+            self.items.append(part)
+            event.succeed()
+            self.merger._forward(self)
+        else:
+            self._put_queue.append((part, event))
+        return event
+
+    def free_capacity(self):
+        return self.capacity - len(self.items)
+
+    def _delivered(self, _):
+        self.busy = False
+        self.merger.merged[self.index] += 1
+        self.merger._forward(self)
+
+class Merger:
+    """
+    Joins N inputs into one output buffer without forwarder processes.
+
+    Each inlet is a queue of the given capacity that its machine writes to
+    (pass merger.inlets[i] as output_buffer); an inlet hands its parts to
+    the output one at a time, in arrival order, so parts of different inlets
+    can be in transit together as with one forwarder per input. merged
+    counts the parts passed on from each inlet since the last reset_stats().
+    """
+    def __init__(self, env, name, output_buffer, inputs=2, capacity=2, labels=None):
+        self.env = env
+        self.name = name
+        self.output_buffer = output_buffer
+        self.inlets = [MergeInlet(self, i, capacity) for i in range(inputs)]
+        self.labels = list(labels) if labels else [f"{name}[{i}]" for i in range(inputs)]
+        self.merged = [0] * inputs
+
+    def _forward(self, inlet):
+        if inlet.busy or not inlet.items:
+            return
+        part = inlet.items.popleft()
+        if inlet._put_queue:
+            queued, event = inlet._put_queue.popleft()
+            inlet.items.append(queued)
+            event.succeed()
+        inlet.busy = True
+        self.output_buffer.put(part).callbacks.append(inlet.delivered)
+
+    def reset_stats(self):
+        self.merged = [0] * len(self.inlets)
+
+    def stats(self):
+        return {"policy": "fifo", "counts": dict(zip(self.labels, self.merged))}
+
+def reset_machine_stats(m):
+    m.working_time = 0
+    m.failed_time_total = 0
+    m.wait_input_time = 0
+    m.blocked_time = 0
+    m.processed_count = 0
+    m.window_wait_time = 0
+
+class _BufferGet(simpy.Event):
+    """Pending DelayBuffer.get; cancel() withdraws it like a Store get."""
+    def __init__(self, buffer):
+        super().__init__(buffer.env)
+        self.buffer = buffer
+
+    def cancel(self):
+        if not self.triggered:
+            self.buffer._get_queue.remove(self)
+
+class DelayBuffer:
+    """Single store with a global capacity cap that includes in-transit + ready."""
+    def __init__(self, env, cap, delay):
+        self.env = env
+        self.delay = delay
+        self.cap = cap
+        self.items = []        # 'ready' queue, like Store.items
+        self.capacity = cap    # like Store.capacity: nominal ready queue cap
+        self._slots = cap      # free global slots
+        self._in_transit = 0
+        self._put_queue = deque()   # (part, event) waiting for a slot
+        self._get_queue = deque()   # consumers waiting for a ready part
+        self.wip_tracker = None     # set by WipTracker
+
+    # --- SimPy-like API so existing code continues to work ---
+
+    def put(self, part):
+        # returns an Event (so callers can 'yield' it) that fires once the part
+        # has passed the transit delay; a part only enters when a slot is free
+        if self._slots > 0 and not self._put_queue:
+            return self._start_transit(part)
+        event = self.env.event()
+        self._put_queue.append((part, event))
+        return event
+
+    def get(self):
+        # returns a cancellable Event (so callers can 'yield' it); the global
+        # slot is released as soon as a consumer receives a ready part
+        event = _BufferGet(self)
+        self._get_queue.append(event)
+        self._serve_gets()
+        return event
+
+    # --- Extras useful to you ---
+
+    def in_transit_count(self):
+        return self._in_transit
+
+    def free_capacity(self):
+        # true free slots across in-transit + ready
+        return self._slots
+
+    # --- internals ---
+
+    def _start_transit(self, part, waiting_put=None):
+        # the transit is a single timed event; arrival is handled in its callbacks
+        self._slots -= 1
+        self._in_transit += 1
+        if self.wip_tracker:
+            self.wip_tracker.change(1)
+        transit = self.env.timeout(self.delay, part)
+        transit.callbacks.append(self._arrive)
+        if waiting_put is not None:
+            transit.callbacks.append(lambda _: waiting_put.succeed())
+        return transit
+
+    def _arrive(self, transit):
+        # once delay elapses, the part moves into the ready queue
+        self._in_transit -= 1
+        self.items.append(transit.value)
+        self._serve_gets()
+
+    def _serve_gets(self):
+        while self._get_queue and self.items:
+            self._get_queue.popleft().succeed(self.items.pop(0))
+            if self.wip_tracker:
+                self.wip_tracker.change(-1)
+            # the consumer took a ready part, so the segment frees one global slot
+            self._slots += 1
+            if self._put_queue:
+                self._start_transit(*self._put_queue.popleft())
+
+class Part:
+    """A part in the line: its ID and defect flag, without a per-instance dict."""
+    __slots__ = ("id", "defect")
+
+    def __init__(self, part_id):
+        self.id = part_id
+        self.defect = 0
+
+class CountingSink:
+    """
+    End of the line that only counts arriving parts instead of storing them,
+    so finished parts are freed and memory does not grow with the run length.
+    """
+    def __init__(self, env):
+        self.env = env
+        self.count = 0
+        self.capacity = float("inf")
+
+    def put(self, part):
+        # accepts immediately; returns an Event so callers can 'yield' it
+        self.count += 1
+        event = self.env.event()
+        event.succeed()
+        return event
+
+    def free_capacity(self):
+        return self.capacity
+
+class Machine:
+    def __init__(self, env, name, input_buffer, output_buffer, process_time,
+                 availability, mttr, working_power, waiting_power, defect_rate = None, defect_sink = None, capacity=1,
+                 calendar=None, rng=None):
+        """
+        :param env: SimPy environment.
+        :param name: Machine name.
+        :param input_buffer: Input channel (simpy.Store).
+        :param output_buffer: Output channel (simpy.Store).
+        :param process_time: Constant processing time.
+        :param availability: Percentage availability (below 100 may trigger breakdowns).
+        :param mttr: Mean time to repair.
+        :param working_power: Power consumption (per sec) while processing.
+        :param waiting_power: Power consumption (per sec) when idle.
+        :param capacity: Concurrency level.
+        :param calendar: ShiftCalendar of the machine (default: no stop windows).
+        :param rng: Random source with random() and expovariate(), e.g. RandomStreams.stream(name)
+                    (default: the global random module).
+        """
+
+        self.env = env
+        self.name = name
+        self.input_buffer = input_buffer
+        self.output_buffer = output_buffer
+        self.process_time = process_time
+        self.availability = availability
+        self.mttr = mttr
+        self.defect_rate = defect_rate
+        self.defect_sink = defect_sink
+        self.working_power = working_power
+        self.waiting_power = waiting_power
+        self.resource = simpy.Resource(env, capacity=capacity)
+        self.is_up = True
+        # breakdown/repair signals: workers block on these instead of polling
+        self.failure_event = env.event()
+        self.repair_event = env.event()
+
+        # Time tracking
+        self.working_time = 0
+        self.failed_time_total = 0
+        self.wait_input_time = 0
+        self.blocked_time = 0
+        self.active_count = 0
+        self.processed_count = 0
+        self.window_wait_time = 0
+        self.wip_tracker = None   # set by WipTracker
+        self.calendar = calendar or ShiftCalendar()
+        self.rng = rng or random
+        self._open_until = -1.0    # end of the current open period, see _shift_wait
+
+        if availability < 100:
+            avail_frac = availability / 100.0
+            self.mtbf = mttr * (avail_frac / (1 - avail_frac))
+            env.process(self._breakdown_cycle())
+        else:
+            self.mtbf = float('inf')
+        # launch workers
+        for _ in range(capacity):
+            env.process(self.run())
+
+    def _breakdown_cycle(self):
+        while True:
+            # up‐time
+            t_up = self.rng.expovariate(1.0 / self.mtbf)
+            yield self.env.timeout(t_up)
+            # go down and wake every worker that waits on the failure signal
+            self.is_up = False
+            self.repair_event = self.env.event()
+            self.failure_event.succeed()
+            # repair
+            t_repair = self.rng.expovariate(1.0 / self.mttr)
+            yield self.env.timeout(t_repair)
+            self.failed_time_total += t_repair
+            # back up
+            self.is_up = True
+            self.failure_event = self.env.event()
+            self.repair_event.succeed()
+
+    def _take_part(self):
+        # block on the input buffer while up; a breakdown cancels the pending
+        # request so no part is taken while the machine is down
+        while True:
+            if not self.is_up:
+                yield self.repair_event
+                continue
+            request = self.input_buffer.get()
+            if not request.triggered:
+                start_wait = self.env.now
+                yield request | self.failure_event
+                self.wait_input_time += self.env.now - start_wait   # starvation only counts while up
+                if not request.triggered:
+                    request.cancel()
+                    continue
+            part = yield request
+            return part
+
+    def _process(self, pt):
+        # one timeout per up-period; a breakdown pre-empts it and the rest
+        # of the work resumes after repair
+        remaining = pt
+        while remaining > 0:
+            if not self.is_up:
+                yield self.repair_event
+                continue
+            start_work = self.env.now
+            done = self.env.timeout(remaining)
+            yield done | self.failure_event
+            worked = self.env.now - start_work
+            self.working_time += worked
+            remaining = 0 if done.processed else remaining - worked
+
+    def _shift_wait(self):
+        # the calendar is only consulted again once the current open period has ended
+        now = self.env.now
+        if now < self._open_until:
+            return 0.0
+        w = self.calendar.wait_time(now)
+        self._open_until = self.calendar.next_close(now + w)
+        return w
+
+    def run(self):
+        while True:
+            with self.resource.request() as req:
+                yield req
+                part = yield from self._take_part()
+
+                # track it
+                self.processed_count += 1
+                self.active_count += 1
+                if self.wip_tracker:
+                    self.wip_tracker.change(1)
+
+                # respect shift schedule
+                w = self._shift_wait()
+                self.window_wait_time += w
+                if w:
+                    yield self.env.timeout(w)
+
+                pt = self.process_time() if callable(self.process_time) else self.process_time
+                yield from self._process(pt)
+
+            # now part is processed, start timing any blocking
+            start_block = self.env.now
+
+            # route to defect or downstream
+            if self.defect_rate is not None and self.defect_sink is not None:
+                if self.rng.random() < self.defect_rate:
+                    part.defect = 1
+                    yield self.defect_sink.put(part)
+                else:
+                    yield self.output_buffer.put(part)
+            else:
+                yield self.output_buffer.put(part)
+
+            # record blocked time and free up the slot
+            self.blocked_time += (self.env.now - start_block)
+            self.active_count -= 1
+            if self.wip_tracker:
+                self.wip_tracker.change(-1)
+
+    def waiting_energy_consumption(self):
+        return self.waiting_power * (self.wait_input_time + self.failed_time_total + self.blocked_time + self.window_wait_time)
+
+    def working_energy_consumption(self):
+        return self.working_power * self.working_time
+
+class WipTracker:
+    """
+    Exact time-weighted WIP: parts in the given delay buffers (ready + in
+    transit) plus parts in the given machines.
+
+    The buffers and machines report every change of their counts, so the
+    integral is updated only when WIP changes and memory stays O(1). With
+    histogram=True the time spent at each WIP level is kept as well (WIP is
+    bounded by the buffer and machine capacities) for exact percentiles.
+    """
+    def __init__(self, env, delay_buffers, machines, histogram=False):
+        self.env = env
+        self.level = sum(len(b.items) + b.in_transit_count() for b in delay_buffers) \
+            + sum(m.active_count for m in machines)
+        self.histogram = {} if histogram else None
+        self.reset()
+        for obj in list(delay_buffers) + list(machines):
+            obj.wip_tracker = self
+
+    def reset(self):
+        # start measuring from now, e.g. after the warm-up
+        self.start = self.last = self.env.now
+        self.area = 0.0      # integral of WIP dt
+        self.area_sq = 0.0   # integral of WIP^2 dt
+        if self.histogram is not None:
+            self.histogram.clear()
+
+    def _advance(self):
+        dt = self.env.now - self.last
+        if dt > 0:
+            self.area += self.level * dt
+            self.area_sq += self.level * self.level * dt
+            if self.histogram is not None:
+                self.histogram[self.level] = self.histogram.get(self.level, 0.0) + dt
+            self.last = self.env.now
+
+    def change(self, delta):
+        self._advance()
+        self.level += delta
+
+    def mean(self):
+        self._advance()
+        elapsed = self.last - self.start
+        return self.area / elapsed if elapsed > 0 else float(self.level)
+
+    def variance(self):
+        mean = self.mean()
+        elapsed = self.last - self.start
+        return max(0.0, self.area_sq / elapsed - mean * mean) if elapsed > 0 else 0.0
+
+    def percentile(self, q):
+        """WIP level not exceeded for q percent of the time (needs histogram=True)."""
+        if self.histogram is None:
+            raise ValueError("WipTracker was created without histogram=True")
+        self._advance()
+        total = sum(self.histogram.values())
+        if total == 0:
+            return self.level
+        covered = 0.0
+        for level in sorted(self.histogram):
+            covered += self.histogram[level]
+            if covered >= q / 100.0 * total:
+                return level
+        return max(self.histogram)
+
+def kwh_per_sec(x):
+    return x / 3600.0
+
+def _seeded_replication(seed, simulation):
+    # re-seed every global RNG the model may touch so no state leaks
+    # between replications sharing a process
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    return simulation(seed)
+
+def _workers(workers=None):
+    return workers or int(os.environ.get("DES_WORKERS", 0)) or os.cpu_count() or 1
+
+def run_replications(simulation, seeds, workers=None, deterministic=True):
+    """
+    Run simulation(seed) once per seed and return the result dicts in seed order.
+
+    Replications are independent, so they are fanned out over a process pool
+    of workers (default: DES_WORKERS or the CPU count). With deterministic=True
+    every replication starts from a freshly seeded RNG, which makes the numbers
+    identical for any number of workers. simulation must be picklable, e.g. the
+    model's module-level run_simulation or a functools.partial of one.
+    """
+    seeds = list(seeds)
+    func = functools.partial(_seeded_replication, simulation=simulation) if deterministic else simulation
+    workers = max(1, min(_workers(workers), len(seeds)))
+    if workers == 1:
+        return [func(seed) for seed in seeds]
+    # fork also works when the model is executed as __main__ of a warm runner worker
+    ctx = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return list(pool.map(func, seeds))
+
+# 97.5% quantiles of Student's t for 1..30 degrees of freedom
+T_975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042)
+
+def relative_half_width(values):
+    """Half-width of the 95% confidence interval of the mean, relative to the mean."""
+    n = len(values)
+    if n < 2:
+        return float("inf")
+    mean = statistics.mean(values)
+    sd = statistics.stdev(values)
+    if sd == 0:
+        return 0.0
+    t = T_975[n - 2] if n - 1 <= len(T_975) else 1.96
+    return t * sd / math.sqrt(n) / abs(mean) if mean else float("inf")
+
+def precision(results):
+    """Relative 95% CI half-widths of throughput and energy per part over replications."""
+    return {"throughput": relative_half_width([res["overall"]["throughput"] for res in results]),
+        "energy_per_part": relative_half_width([energy_per_part(res) for res in results])}
+
+def run_adaptive_replications(simulation, seeds, target, min_runs=3, workers=None):
+    """
+    Run replications in seed order until the KPIs are precise enough.
+
+    Replications run in parallel batches of `workers`; after each batch the
+    smallest number of runs (at least min_runs) whose relative 95% CI
+    half-widths of throughput and energy per part are both at most target is
+    kept. The stopping point only depends on the seeds, not on the batch
+    size. Runs at most len(seeds) replications; returns (seeds, results).
+    """
+    seeds = list(seeds)
+    workers = _workers(workers)
+    results = []
+    checked = max(2, min_runs) - 1
+    while len(results) < len(seeds):
+        batch = max(workers, min_runs - len(results))
+        results += run_replications(simulation, seeds[len(results):len(results) + batch], workers)
+        for n in range(checked + 1, len(results) + 1):
+            if max(precision(results[:n]).values()) <= target:
+                return seeds[:n], results[:n]
+        checked = len(results)
+    return seeds, results
+
+def energy_per_part(res):
+    """Total energy of all machines in one replication divided by its produced parts."""
+    total_energy_run = sum(mdata["total_energy"] for mdata in res["machine_energy"].values())
+    produced_parts = res["overall"]["produced_parts"]
+    return total_energy_run / produced_parts if produced_parts > 0 else 0
+
+def aggregate_routing(results):
+    """Parts per Splitter output / Merger input summed over replications, with their shares."""
+    routing = {}
+    for res in results:
+        for name, stats in res.get("routing", {}).items():
+            entry = routing.setdefault(name, {"policy": stats["policy"], "counts": Counter()})
+            entry["counts"].update(stats["counts"])
+    for entry in routing.values():
+        total = sum(entry["counts"].values())
+        entry["counts"] = dict(entry["counts"])
+        entry["shares"] = {label: count / total if total else 0.0 for label, count in entry["counts"].items()}
+    return routing
+
+def aggregate_replications(results):
+    """Mean overall KPIs, energy per part, bottleneck frequency and routing over all replications."""
+    bottleneck_results = []
+    for res in results:
+        # top_3 holds (machine name, data) pairs
+        for machine_name, _ in res["bottleneck"]["top_3"]:
+            bottleneck_results.append(machine_name)
+    return {"throughput": statistics.mean(res["overall"]["throughput"] for res in results),
+        "wip": statistics.mean(res["overall"]["wip"] for res in results),
+        "energy_per_part": statistics.mean(energy_per_part(res) for res in results),
+        "bottleneck_frequency": Counter(bottleneck_results),
+        "routing": aggregate_routing(results)}
+
+def write_result_document(path, seeds, results, summary):
+    """
+    Write the machine-readable result document that the pipeline reads
+    instead of parsing the printed KPIs.
+    """
+    document = {"runs": len(results),
+        "seeds": list(seeds),
+        "summary": {"throughput": summary["throughput"],
+            "wip": summary["wip"],
+            "energy_per_part": summary["energy_per_part"]},
+        "bottleneck_frequency": dict(summary["bottleneck_frequency"]),
+        "routing": summary["routing"],
+        "relative_half_width": precision(results),
+        "replications": [{"seed": seed, "energy_per_part": energy_per_part(res), **res}
+            for seed, res in zip(seeds, results)]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f)
+
+def report(seeds, results, result_file=None):
+    """Print the mean KPIs and bottleneck frequency, and write the result document if requested."""
+    runs = len(seeds)
+    summary = aggregate_replications(results)
+
+    print(f"\n=== Mean Overall KPIs over {runs} runs ===")
+    print(f"Throughput = {summary['throughput']:.2f} parts/hour")
+    print(f"WIP = {summary['wip']:.2f} parts")
+    print(f"Mean Energy Consumption per Part = {summary['energy_per_part']:.4f} kWh/part")
+
+    # --- Bottleneck Aggregation ---
+    print("\n=== Bottleneck Frequency over runs ===")
+    for machine, count in summary["bottleneck_frequency"].items():
+         print(f"{machine}: {count} times")
+
+    if summary["routing"]:
+        print("\n=== Routing over runs ===")
+        for name, entry in summary["routing"].items():
+            print(f"{name} ({entry['policy']}): "
+                  + ", ".join(f"{label} {share:.1%}" for label, share in entry["shares"].items()))
+
+    if result_file:
+        write_result_document(result_file, seeds, results, summary)
+
+def run_and_report(simulation, replications=10, seed=11):
+    """
+    The replications the runner asks for, and their report: the `__main__` of a model.
+
+    Runs the seeds in DES_SEEDS, or seed, seed + 1, ... (replications of
+    them; DES_MAX_REPLICATIONS with a DES_TARGET_HALF_WIDTH, which stops
+    once throughput and energy per part are that precise, after at least
+    DES_MIN_REPLICATIONS runs), prints the KPIs and writes the result
+    document to DES_RESULT_FILE if set.
+    """
+    environ = os.environ
+    target = float(environ.get("DES_TARGET_HALF_WIDTH") or 0)
+    if environ.get("DES_SEEDS"):
+        seeds = [int(value) for value in environ["DES_SEEDS"].split(",")]
+    else:
+        # Different seed for each run.
+        seeds = [seed + i for i in range(int(environ.get("DES_MAX_REPLICATIONS") or 30) if target else replications)]
+    if target:
+        seeds, results = run_adaptive_replications(simulation, seeds, target, int(environ.get("DES_MIN_REPLICATIONS") or 3))
+    else:
+        results = run_replications(simulation, seeds)
+    report(seeds, results, environ.get("DES_RESULT_FILE"))
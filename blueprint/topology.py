@@ -0,0 +1,769 @@
+"""
+Declarative production-line specs and the simulation they compile to.
+
+A spec is a JSON-compatible dict describing the line instead of code:
+
+    {"sim_time": 2592000, "warmup": 86400, "replications": 10, "seed": 11,
+     "stop_windows": ["Mon-Fri 16:00-24:00"],
+     "source": {"output": "raw_input", "interarrival": 1},
+     "buffers": [{"name": "raw_input", "capacity": 1000},
+                 {"name": "buffer1", "capacity": 2, "delay": 10}, ...],
+     "machines": [{"name": "M1", "input": "raw_input", "output": "buffer1", "process_time": 5,
+                   "availability": 97.79, "mttr": 74, "working_power_kw": 1.28, "waiting_power_kw": 1.25,
+                   "capacity": 1, "defect_rate": null, "defect_sink": null}, ...],
+     "splitters": [{"name": "split", "input": "buffer2", "outputs": ["pre_m3", "pre_m4"],
+                    "policy": "round_robin"}],
+     "mergers": [{"name": "merge", "inputs": ["post_m3", "post_m4"], "output": "buffer3"}],
+     "sinks": ["sink", "defects"], "product_sink": "sink"}
+
+Buffers with a delay behave like the blueprint's DelayBuffer and count
+towards WIP; buffers without one are plain stores. stop_windows take the
+ShiftCalendar syntax and can be overridden per machine. Splitters take
+any number of outputs and a policy of des_lib.Splitter; the parts each
+splitter output and merger input passed on are reported under "routing"
+in the results. The semantics are those of des_lib (Machine, Splitter,
+Merger, CountingSink, WipTracker, RandomStreams), and the result dicts
+have the same layout as the blueprint's run_simulation, so the
+replication, precision and reporting helpers of des_lib are reused
+unchanged.
+
+compile_spec turns a spec into a Line: every callback is bound once, parts
+are plain integers moved between queues by callbacks instead of one
+generator frame per part, and machine and worker state lives in flat lists
+indexed by machine and worker number. The line runs on a plain heapq event
+calendar ("backend": "heap", the default) or on SimPy ("simpy"); both give
+identical results, see benchmarks/bench_kernels.py. to_program wraps a spec
+into the small model program the pipeline runs.
+"""
+import functools
+import heapq
+import pprint
+from collections import deque
+import simpy
+from blueprint import des_lib as lib
+
+EXAMPLE_SPEC = {
+    "sim_time": 3600 * 24 * 30, "warmup": 24 * 3600, "replications": 10, "seed": 11,
+    "stop_windows": ["Mon-Fri 16:00-24:00"],
+    "source": {"output": "raw_input", "interarrival": 1},
+    "buffers": [{"name": "raw_input", "capacity": 1000},
+                {"name": "buffer1", "capacity": 2, "delay": 10},
+                {"name": "buffer2", "capacity": 2, "delay": 10},
+                {"name": "buffer3", "capacity": 2, "delay": 10},
+                {"name": "branch1_out", "capacity": 2},
+                {"name": "branch2_out", "capacity": 2}],
+    "machines": [
+        {"name": "M1", "input": "raw_input", "output": "buffer1", "process_time": 5,
+         "availability": 97.79, "mttr": 74, "working_power_kw": 1.28, "waiting_power_kw": 1.25},
+        {"name": "M2", "input": "buffer1", "output": "buffer2", "process_time": 20,
+         "availability": 95.0, "mttr": 100, "working_power_kw": 1.28, "waiting_power_kw": 1.25},
+        {"name": "M3parallel", "input": "buffer2", "output": "branch1_out", "process_time": 15,
+         "availability": 90.0, "mttr": 80, "working_power_kw": 1.28, "waiting_power_kw": 1.25},
+        {"name": "M4parallel", "input": "buffer2", "output": "branch2_out", "process_time": 15,
+         "availability": 90.0, "mttr": 80, "working_power_kw": 1.28, "waiting_power_kw": 1.25},
+        {"name": "M5", "input": "buffer3", "output": "sink", "process_time": 25,
+         "availability": 92.0, "mttr": 90, "working_power_kw": 1.28, "waiting_power_kw": 1.25,
+         "defect_rate": 0.089, "defect_sink": "defects"}],
+    "splitters": [],
+    "mergers": [{"name": "merge_M3_M4", "inputs": ["branch1_out", "branch2_out"], "output": "buffer3"}],
+    "sinks": ["sink", "defects"],
+    "product_sink": "sink"}
+
+_MACHINE_KEYS = ("name", "input", "output", "process_time", "availability", "mttr",
+                 "working_power_kw", "waiting_power_kw")
+
+def _number(value, what, integer=False):
+    # JSON booleans are ints in Python, but no number in a spec
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+        raise ValueError(f"{what} must be {'an integer' if integer else 'a number'}, got {value!r}")
+    return value
+
+def _object(value, what):
+    if not isinstance(value, dict):
+        raise ValueError(f"{what} must be a JSON object, got {value!r}")
+    return value
+
+def _list(value, what):
+    if not isinstance(value, list):
+        raise ValueError(f"{what} must be a list, got {value!r}")
+    return value
+
+def _name(value, what):
+    if not isinstance(value, str):
+        raise ValueError(f"{what} must be a string, got {value!r}")
+    return value
+
+def _stop_windows(value, what):
+    for window in _list(value, what):
+        _name(window, f"{what} entry")
+    lib.ShiftCalendar(value)   # raises on malformed windows
+
+def validate(spec):
+    """
+    Check a spec and return a copy with the optional fields filled in.
+
+    Raises ValueError naming the first problem, e.g. a machine reading from
+    an unknown buffer or a capacity given as a string, so the message can be
+    handed back to the LLM.
+    """
+    _object(spec, "Spec")
+    spec = {**spec}
+    spec.setdefault("sim_time", EXAMPLE_SPEC["sim_time"])
+    spec.setdefault("warmup", EXAMPLE_SPEC["warmup"])
+    spec.setdefault("measure_until", spec["sim_time"])
+    spec.setdefault("replications", EXAMPLE_SPEC["replications"])
+    spec.setdefault("seed", EXAMPLE_SPEC["seed"])
+    spec.setdefault("stop_windows", [])
+    spec.setdefault("splitters", [])
+    spec.setdefault("mergers", [])
+    spec.setdefault("backend", "heap")
+    if not isinstance(spec["backend"], str) or spec["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown backend {spec['backend']!r}, expected one of {sorted(BACKENDS)}")
+    for key in ("sim_time", "warmup", "measure_until"):
+        _number(spec[key], key)
+    _number(spec["replications"], "replications", integer=True)
+    _number(spec["seed"], "seed", integer=True)
+    if not 0 <= spec["warmup"] <= spec["measure_until"] <= spec["sim_time"]:
+        raise ValueError("Spec needs 0 <= warmup <= measure_until <= sim_time")
+    if spec["replications"] < 1:
+        raise ValueError("Spec needs at least 1 replication")
+    _stop_windows(spec["stop_windows"], "stop_windows")
+
+    buffers = {}
+    for buffer in _list(spec.get("buffers") or [], "buffers"):
+        _object(buffer, "Buffer")
+        if "name" not in buffer or "capacity" not in buffer:
+            raise ValueError(f"Buffer {buffer!r} needs a name and a capacity")
+        name = _name(buffer["name"], "Buffer name")
+        if name in buffers:
+            raise ValueError(f"Duplicate buffer {name!r}")
+        if not _number(buffer["capacity"], f"Buffer {name!r} capacity", integer=True) >= 1:
+            raise ValueError(f"Buffer {name!r} needs a capacity of at least 1")
+        if buffer.get("delay") is not None and _number(buffer["delay"], f"Buffer {name!r} delay") < 0:
+            raise ValueError(f"Buffer {name!r} has a negative delay")
+        buffers[name] = buffer
+    sinks = list(_list(spec.get("sinks") or [], "sinks"))
+    if not sinks:
+        raise ValueError("Spec needs at least one sink")
+    for name in sinks:
+        if _name(name, "Sink") in buffers:
+            raise ValueError(f"{name!r} is both a buffer and a sink")
+    spec.setdefault("product_sink", sinks[0])
+    if spec["product_sink"] not in sinks:
+        raise ValueError(f"product_sink {spec['product_sink']!r} is not one of the sinks {sinks}")
+
+    def check(name, role, allow_sink=True):
+        if not isinstance(name, str) or name not in buffers and not (allow_sink and name in sinks):
+            raise ValueError(f"{role} refers to unknown {'buffer or sink' if allow_sink else 'buffer'} {name!r}")
+
+    source = _object(spec.get("source") or {}, "source")
+    check(source.get("output"), "source output")
+    if not _number(source.get("interarrival", 0), "source interarrival") > 0:
+        raise ValueError("source needs a positive interarrival time")
+
+    machines = []
+    for machine in _list(spec.get("machines") or [], "machines"):
+        _object(machine, "Machine")
+        missing = [key for key in _MACHINE_KEYS if key not in machine]
+        if missing:
+            raise ValueError(f"Machine {machine.get('name', machine)!r} misses {missing}")
+        machine = {"capacity": 1, "defect_rate": None, "defect_sink": None, **machine}
+        name = _name(machine["name"], "Machine name")
+        for key in ("process_time", "availability", "mttr", "working_power_kw", "waiting_power_kw"):
+            _number(machine[key], f"Machine {name!r} {key}")
+        _number(machine["capacity"], f"Machine {name!r} capacity", integer=True)
+        check(machine["input"], f"Machine {name!r} input", allow_sink=False)
+        check(machine["output"], f"Machine {name!r} output")
+        rate = machine["defect_rate"]
+        if rate is not None and not 0 <= _number(rate, f"Machine {name!r} defect_rate") <= 1:
+            raise ValueError(f"Machine {name!r} needs a defect_rate in [0, 1]")
+        if machine["defect_sink"] is not None:
+            check(machine["defect_sink"], f"Machine {name!r} defect_sink")
+        if not 0 < machine["availability"] <= 100:
+            raise ValueError(f"Machine {name!r} needs an availability in (0, 100]")
+        if machine["process_time"] < 0 or machine["mttr"] <= 0 or machine["capacity"] < 1:
+            raise ValueError(f"Machine {name!r} needs process_time >= 0, mttr > 0 and capacity >= 1")
+        if machine.get("stop_windows") is not None:
+            _stop_windows(machine["stop_windows"], f"Machine {name!r} stop_windows")
+        machines.append(machine)
+    if not machines:
+        raise ValueError("Spec needs at least one machine")
+    names = [machine["name"] for machine in machines]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Machine names must be unique, got {names}")
+
+    splitters = []
+    for i, splitter in enumerate(_list(spec["splitters"], "splitters")):
+        splitter = {"name": f"splitter{i + 1}", "policy": "round_robin", **_object(splitter, "Splitter")}
+        _name(splitter["name"], "Splitter name")
+        check(splitter.get("input"), "splitter input", allow_sink=False)
+        if len(_list(splitter.get("outputs") or [], f"Splitter {splitter['name']!r} outputs")) < 2:
+            raise ValueError(f"Splitter {splitter['name']!r} needs at least 2 outputs")
+        for output in splitter["outputs"]:
+            check(output, "splitter output")
+        if splitter["policy"] not in lib.Splitter.POLICIES:
+            raise ValueError(f"Splitter {splitter['name']!r} has unknown policy {splitter['policy']!r}, "
+                             f"expected one of {lib.Splitter.POLICIES}")
+        splitters.append(splitter)
+    mergers = []
+    for i, merger in enumerate(_list(spec["mergers"], "mergers")):
+        merger = {"name": f"merger{i + 1}", **_object(merger, "Merger")}
+        _name(merger["name"], "Merger name")
+        if not _list(merger.get("inputs") or [], f"Merger {merger['name']!r} inputs"):
+            raise ValueError(f"Merger {merger['name']!r} needs inputs")
+        for name in merger["inputs"]:
+            check(name, "merger input", allow_sink=False)
+        check(merger.get("output"), "merger output")
+        mergers.append(merger)
+    routers = [router["name"] for router in splitters + mergers]
+    if len(set(routers)) != len(routers):
+        raise ValueError(f"Splitter and merger names must be unique, got {routers}")
+    spec.update(source=source, buffers=list(buffers.values()), sinks=sinks, machines=machines,
+                splitters=splitters, mergers=mergers)
+    return spec
+
+class _Queue:
+    """A buffer of the compiled line: a plain store, or a DelayBuffer when delay is set."""
+    __slots__ = ("line", "capacity", "delay", "items", "slots", "in_transit", "getters", "putters", "arrive")
+
+    def __init__(self, line, capacity, delay):
+        self.line = line
+        self.capacity = capacity
+        self.delay = delay
+        self.items = deque()
+        self.slots = capacity    # free global slots (in transit + ready) of a delay buffer
+        self.in_transit = 0
+        self.getters = deque()   # deliver(part) callbacks of waiting consumers
+        self.putters = deque()   # (part, done) of producers waiting for space
+        self.arrive = self._arrive
+
+    def free_slots(self):
+        return self.slots if self.delay is not None else self.capacity - len(self.items)
+
+    def put(self, part, done):
+        # done() is called once the part is in (after the transit delay of a delay buffer)
+        if self.delay is None:
+            if len(self.items) < self.capacity:
+                self.items.append(part)
+                done()
+                self.serve()
+            else:
+                self.putters.append((part, done))
+        elif self.slots > 0 and not self.putters:
+            self._transit(part, done)
+        else:
+            self.putters.append((part, done))
+
+    def get(self, deliver):
+        self.getters.append(deliver)
+        self.serve()
+
+    def cancel(self, deliver):
+        try:
+            self.getters.remove(deliver)
+        except ValueError:
+            pass
+
+    def _transit(self, part, done):
+        self.slots -= 1
+        self.in_transit += 1
+        self.line.wip_change(1)
+        self.line.call_later(self.delay, self.arrive, (part, done))
+
+    def _arrive(self, event):
+        part, done = event._value
+        self.in_transit -= 1
+        self.items.append(part)
+        done()
+        self.serve()
+
+    def serve(self):
+        items, getters, putters = self.items, self.getters, self.putters
+        while getters and items:
+            part = items.popleft()
+            deliver = getters.popleft()
+            admitted = None
+            if self.delay is not None:
+                # the consumer took a ready part, so one global slot is free again
+                self.line.wip_change(-1)
+                self.slots += 1
+                if putters:
+                    self._transit(*putters.popleft())
+            elif putters:
+                queued, admitted = putters.popleft()
+                items.append(queued)
+            deliver(part)
+            if admitted is not None:
+                admitted()
+
+class _Sink:
+    """Counts arriving parts, like CountingSink."""
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+    def free_slots(self):
+        return float("inf")
+
+    def put(self, part, done):
+        self.count += 1
+        done()
+
+class _Splitter:
+    """N-way splitter with the policies of des_lib.Splitter."""
+    __slots__ = ("name", "source", "outputs", "labels", "policy", "turn", "routed", "deliver", "sent")
+
+    def __init__(self, name, source, outputs, labels, policy):
+        self.name = name
+        self.source = source
+        self.outputs = outputs
+        self.labels = labels
+        self.policy = policy
+        self.turn = 0
+        self.routed = [0] * len(outputs)
+        self.deliver = self._deliver
+        self.sent = self._sent
+
+    def start(self):
+        self.source.get(self.deliver)
+
+    def _choose(self):
+        outputs, n = self.outputs, len(self.outputs)
+        if self.policy == "first_free":
+            return next((i for i in range(n) if outputs[i].free_slots() > 0), self.turn)
+        if self.policy == "shortest_queue":
+            best = max(range(n), key=lambda i: outputs[i].free_slots())
+            return best if outputs[best].free_slots() > 0 else self.turn
+        return next((i % n for i in range(self.turn, self.turn + n) if outputs[i % n].free_slots() > 0), self.turn)
+
+    def _deliver(self, part):
+        i = self._choose()
+        self.turn = (i + 1) % len(self.outputs)
+        self.routed[i] += 1
+        self.outputs[i].put(part, self.sent)
+
+    def _sent(self):
+        self.source.get(self.deliver)
+
+    def reset_stats(self):
+        self.routed = [0] * len(self.outputs)
+
+    def stats(self):
+        return {"policy": self.policy, "counts": dict(zip(self.labels, self.routed))}
+
+class _Merger:
+    """Joins N input queues into one output; each input hands over one part at a time."""
+    __slots__ = ("name", "labels", "merged", "inputs")
+
+    def __init__(self, name, sources, target, labels):
+        self.name = name
+        self.labels = labels
+        self.merged = [0] * len(sources)
+        self.inputs = [_MergeInput(self, i, source, target) for i, source in enumerate(sources)]
+
+    def start(self):
+        for merge_input in self.inputs:
+            merge_input.source.get(merge_input.deliver)
+
+    def reset_stats(self):
+        self.merged = [0] * len(self.inputs)
+
+    def stats(self):
+        return {"policy": "fifo", "counts": dict(zip(self.labels, self.merged))}
+
+class _MergeInput:
+    __slots__ = ("merger", "index", "source", "target", "deliver", "sent")
+
+    def __init__(self, merger, index, source, target):
+        self.merger = merger
+        self.index = index
+        self.source = source
+        self.target = target
+        self.deliver = self._deliver
+        self.sent = self._sent
+
+    def _deliver(self, part):
+        self.target.put(part, self.sent)
+
+    def _sent(self):
+        self.merger.merged[self.index] += 1
+        self.source.get(self.deliver)
+
+class _SimpyEnvironment(simpy.Environment):
+    """SimPy backend: every scheduled callback is a Timeout event."""
+    def call_later(self, delay, callback, value=None):
+        event = simpy.Timeout(self, delay, value)
+        event.callbacks.append(callback)
+        return event
+
+class _Record:
+    """A scheduled callback of HeapEnvironment; reused once it has fired."""
+    __slots__ = ("callback", "_value")   # _value as on SimPy events, so callbacks serve both backends
+
+class HeapEnvironment:
+    """
+    Minimal event calendar: a heapq of (time, sequence, record).
+
+    Equal times fire in scheduling order like SimPy's normal-priority
+    events, so a Line gives the same results on both backends; there are no
+    generators, conditions or new event objects per wait, as fired records
+    are recycled.
+    """
+    def __init__(self, initial_time=0.0):
+        self._now = initial_time
+        self._queue = []
+        self._sequence = 0
+        self._free = []
+
+    @property
+    def now(self):
+        return self._now
+
+    def call_later(self, delay, callback, value=None):
+        if delay < 0:
+            raise ValueError(f"Negative delay {delay}")
+        free = self._free
+        record = free.pop() if free else _Record()
+        record.callback = callback
+        record._value = value
+        self._sequence += 1
+        heapq.heappush(self._queue, (self._now + delay, self._sequence, record))
+        return record
+
+    def run(self, until):
+        # like simpy's run(until): events at exactly `until` stay scheduled
+        if until <= self._now:
+            raise ValueError(f"until ({until}) must be greater than the current time ({self._now})")
+        queue, free, pop = self._queue, self._free, heapq.heappop
+        while queue and queue[0][0] < until:
+            self._now, _, record = pop(queue)
+            record.callback(record)
+            free.append(record)
+        self._now = until
+
+BACKENDS = {"heap": HeapEnvironment, "simpy": _SimpyEnvironment}
+
+# worker phases
+_WAIT_INPUT, _WAIT_REPAIR_INPUT, _SHIFT, _WORK, _WAIT_REPAIR_WORK, _BLOCKED = range(6)
+
+class Line:
+    """
+    Compiled simulation of one replication of a validated spec.
+
+    Machines are numbered in spec order and their workers (capacity many
+    per machine) consecutively; all per-machine and per-worker state is kept
+    in flat lists indexed by those numbers. backend names the event
+    calendar (see BACKENDS), by default the spec's.
+    """
+    def __init__(self, spec, seed, backend=None):
+        self.spec = spec
+        self.seed = seed
+        self.env = BACKENDS[backend or spec["backend"]]()
+        self.call_later = self.env.call_later
+        streams = lib.RandomStreams(seed)
+
+        self.queues = {b["name"]: _Queue(self, b["capacity"], b.get("delay")) for b in spec["buffers"]}
+        self.sinks = {name: _Sink() for name in spec["sinks"]}
+        nodes = {**self.queues, **self.sinks}
+        self.delay_queues = [q for q in self.queues.values() if q.delay is not None]
+
+        default_calendar = lib.ShiftCalendar(spec["stop_windows"])
+        machines = spec["machines"]
+        n = len(machines)
+        self.names = [m["name"] for m in machines]
+        self.m_input = [self.queues[m["input"]] for m in machines]
+        self.m_output = [nodes[m["output"]] for m in machines]
+        self.m_defect_sink = [nodes[m["defect_sink"]] if m["defect_sink"] is not None else None for m in machines]
+        self.m_defect_rate = [m["defect_rate"] if m["defect_sink"] is not None else None for m in machines]
+        self.m_process_time = [m["process_time"] for m in machines]
+        self.m_mttr = [m["mttr"] for m in machines]
+        self.m_mtbf = [m["mttr"] * (m["availability"] / (100.0 - m["availability"])) if m["availability"] < 100
+                       else float("inf") for m in machines]
+        self.m_working_power = [lib.kwh_per_sec(m["working_power_kw"]) for m in machines]
+        self.m_waiting_power = [lib.kwh_per_sec(m["waiting_power_kw"]) for m in machines]
+        self.m_calendar = [lib.ShiftCalendar(m["stop_windows"]) if m.get("stop_windows") is not None
+                           else default_calendar for m in machines]
+        self.m_rng = [streams.stream(name) for name in self.names]
+        self.m_up = [True] * n
+        self.m_repair_time = [0.0] * n
+        self.m_open_until = [-1.0] * n
+        self.m_repair_waiters = [[] for _ in range(n)]
+        self.m_active = [0] * n
+        self.m_workers = []
+        self.reset_stats()
+
+        self.w_machine = []
+        for m, machine in enumerate(machines):
+            first = len(self.w_machine)
+            self.w_machine += [m] * machine["capacity"]
+            self.m_workers.append(range(first, len(self.w_machine)))
+        workers = len(self.w_machine)
+        self.w_phase = [_WAIT_INPUT] * workers
+        self.w_part = [None] * workers
+        self.w_remaining = [0.0] * workers
+        self.w_start = [0.0] * workers
+        self.w_work_event = [None] * workers
+        # pre-bound per-worker callbacks
+        self.w_deliver = [functools.partial(self._got_part, w) for w in range(workers)]
+        self.w_done = [functools.partial(self._put_done, w) for w in range(workers)]
+        self._after_shift = self._after_shift_cb
+        self._work_done = self._work_done_cb
+        self._fail = self._fail_cb
+        self._repair = self._repair_cb
+        self._next_part = self._next_part_cb
+        self._emitted = self._emitted_cb
+
+        # time-weighted WIP: delay buffers (ready + in transit) plus parts in the machines
+        self.wip_level = 0
+        self.reset_wip()
+
+        for m in range(n):
+            if self.m_mtbf[m] != float("inf"):
+                self.call_later(self.m_rng[m].expovariate(1.0 / self.m_mtbf[m]), self._fail, m)
+            for w in self.m_workers[m]:
+                self._request(w)
+        self.routers = []
+        for splitter in spec["splitters"]:
+            self.routers.append(_Splitter(splitter["name"], self.queues[splitter["input"]],
+                                          [nodes[name] for name in splitter["outputs"]], splitter["outputs"],
+                                          splitter["policy"]))
+        for merger in spec["mergers"]:
+            self.routers.append(_Merger(merger["name"], [self.queues[name] for name in merger["inputs"]],
+                                        nodes[merger["output"]], merger["inputs"]))
+        for router in self.routers:
+            router.start()
+        self.source = nodes[spec["source"]["output"]]
+        self.interarrival = spec["source"]["interarrival"]
+        self.part_id = 0
+        self._next_part_cb(None)
+
+    def reset_stats(self):
+        n = len(self.names)
+        self.m_working = [0.0] * n
+        self.m_failed = [0.0] * n
+        self.m_wait_input = [0.0] * n
+        self.m_blocked = [0.0] * n
+        self.m_processed = [0] * n
+        self.m_window_wait = [0.0] * n
+
+    def reset_wip(self):
+        self.wip_start = self.wip_last = self.env.now
+        self.wip_area = 0.0
+        self.wip_area_sq = 0.0
+
+    def wip_change(self, delta):
+        now = self.env._now
+        dt = now - self.wip_last
+        if dt > 0:
+            level = self.wip_level
+            self.wip_area += level * dt
+            self.wip_area_sq += level * level * dt
+            self.wip_last = now
+        self.wip_level += delta
+
+    # --- source ---
+
+    def _next_part_cb(self, _):
+        self.source.put(self.part_id, self._emitted)
+
+    def _emitted_cb(self):
+        self.part_id += 1
+        self.call_later(self.interarrival, self._next_part)
+
+    # --- breakdowns ---
+
+    def _fail_cb(self, event):
+        m = event._value
+        now = self.env._now
+        self.m_up[m] = False
+        waiters = self.m_repair_waiters[m]
+        for w in self.m_workers[m]:
+            phase = self.w_phase[w]
+            if phase == _WAIT_INPUT:
+                # no part is taken while the machine is down; starvation only counts while up
+                self.m_input[m].cancel(self.w_deliver[w])
+                self.m_wait_input[m] += now - self.w_start[w]
+                self.w_phase[w] = _WAIT_REPAIR_INPUT
+                waiters.append(w)
+            elif phase == _WORK:
+                worked = now - self.w_start[w]
+                self.m_working[m] += worked
+                self.w_remaining[w] -= worked
+                self.w_work_event[w] = None
+                self.w_phase[w] = _WAIT_REPAIR_WORK
+                waiters.append(w)
+        repair = self.m_rng[m].expovariate(1.0 / self.m_mttr[m])
+        self.m_repair_time[m] = repair
+        self.call_later(repair, self._repair, m)
+
+    def _repair_cb(self, event):
+        m = event._value
+        self.m_failed[m] += self.m_repair_time[m]
+        self.m_up[m] = True
+        waiters, self.m_repair_waiters[m] = self.m_repair_waiters[m], []
+        for w in waiters:
+            if self.w_phase[w] == _WAIT_REPAIR_INPUT:
+                self._request(w)
+            else:
+                self._work(w)
+        self.call_later(self.m_rng[m].expovariate(1.0 / self.m_mtbf[m]), self._fail, m)
+
+    # --- worker cycle: take part, shift wait, work, hand over ---
+
+    def _request(self, w):
+        m = self.w_machine[w]
+        if not self.m_up[m]:
+            self.w_phase[w] = _WAIT_REPAIR_INPUT
+            self.m_repair_waiters[m].append(w)
+            return
+        self.w_phase[w] = _WAIT_INPUT
+        self.w_start[w] = self.env._now
+        self.m_input[m].get(self.w_deliver[w])
+
+    def _got_part(self, w, part):
+        m = self.w_machine[w]
+        now = self.env._now
+        self.m_wait_input[m] += now - self.w_start[w]
+        self.w_part[w] = part
+        self.m_processed[m] += 1
+        self.m_active[m] += 1
+        self.wip_change(1)
+        self.w_remaining[w] = self.m_process_time[m]
+        # the calendar is only consulted again once the current open period has ended
+        if now < self.m_open_until[m]:
+            self._work(w)
+            return
+        calendar = self.m_calendar[m]
+        wait = calendar.wait_time(now)
+        self.m_open_until[m] = calendar.next_close(now + wait)
+        if wait:
+            self.m_window_wait[m] += wait
+            self.w_phase[w] = _SHIFT
+            self.call_later(wait, self._after_shift, w)
+        else:
+            self._work(w)
+
+    def _after_shift_cb(self, event):
+        self._work(event._value)
+
+    def _work(self, w):
+        m = self.w_machine[w]
+        if not self.m_up[m]:
+            self.w_phase[w] = _WAIT_REPAIR_WORK
+            self.m_repair_waiters[m].append(w)
+            return
+        remaining = self.w_remaining[w]
+        if remaining <= 0:
+            self._finish(w)
+            return
+        self.w_phase[w] = _WORK
+        self.w_start[w] = self.env._now
+        self.w_work_event[w] = self.call_later(remaining, self._work_done, w)
+
+    def _work_done_cb(self, event):
+        w = event._value
+        if event is not self.w_work_event[w]:
+            return   # pre-empted by a breakdown
+        self.w_work_event[w] = None
+        m = self.w_machine[w]
+        self.m_working[m] += self.env._now - self.w_start[w]
+        self.w_remaining[w] = 0
+        self._finish(w)
+
+    def _finish(self, w):
+        m = self.w_machine[w]
+        self.w_phase[w] = _BLOCKED
+        self.w_start[w] = self.env._now
+        part = self.w_part[w]
+        rate = self.m_defect_rate[m]
+        if rate is not None and self.m_rng[m].random() < rate:
+            self.m_defect_sink[m].put(part, self.w_done[w])
+        else:
+            self.m_output[m].put(part, self.w_done[w])
+
+    def _put_done(self, w):
+        m = self.w_machine[w]
+        self.m_blocked[m] += self.env._now - self.w_start[w]
+        self.m_active[m] -= 1
+        self.wip_change(-1)
+        self.w_part[w] = None
+        self._request(w)
+
+    # --- run ---
+
+    def run(self):
+        """Simulate warm-up and measurement period; returns a run_simulation-style result dict."""
+        spec = self.spec
+        warmup, measure_until = spec["warmup"], spec["measure_until"]
+        if warmup > 0:
+            self.env.run(until=warmup)
+        self.reset_stats()
+        for router in self.routers:
+            router.reset_stats()
+        sink = self.sinks[spec["product_sink"]]
+        produced_before = sink.count
+        self.reset_wip()
+        self.env.run(until=measure_until)
+
+        self.wip_change(0)
+        elapsed = self.wip_last - self.wip_start
+        wip = self.wip_area / elapsed if elapsed > 0 else float(self.wip_level)
+        wip_var = max(0.0, self.wip_area_sq / elapsed - wip * wip) if elapsed > 0 else 0.0
+        total_produced = sink.count - produced_before
+        hours = (measure_until - warmup) / 3600.0
+        result = {"overall": {
+                "throughput": total_produced / hours if hours > 0 else 0.0,
+                "wip": wip,
+                "wip_std": wip_var ** 0.5,
+                "produced_parts": total_produced},
+            "machine_energy": {}}
+        bottleneck_data = {}
+        for m, name in enumerate(self.names):
+            waiting_energy = self.m_waiting_power[m] * (self.m_wait_input[m] + self.m_failed[m]
+                                                         + self.m_blocked[m] + self.m_window_wait[m])
+            working_energy = self.m_working_power[m] * self.m_working[m]
+            result["machine_energy"][name] = {
+                "working_time": self.m_working[m],
+                "waiting_time": self.m_failed[m] + self.m_blocked[m],
+                "working_energy": working_energy,
+                "waiting_energy": waiting_energy,
+                "total_energy": waiting_energy + working_energy}
+            util = self.m_working[m] / (measure_until - warmup) * 100.0 if measure_until > warmup else 0.0
+            bottleneck_data[name] = {"throughput": self.m_processed[m] / hours if hours > 0 else 0.0,
+                                     "utilization": util, "processed_count": self.m_processed[m]}
+        result["bottleneck"] = {
+            "top_3": sorted(bottleneck_data.items(), key=lambda kv: kv[1]["utilization"], reverse=True)[:3],
+            "all": bottleneck_data}
+        result["routing"] = {router.name: router.stats() for router in self.routers}
+        return result
+
+def compile_spec(spec, seed, backend=None):
+    """Validate a spec and build its simulation for one replication."""
+    return Line(validate(spec), seed, backend)
+
+def simulate(spec, seed, backend=None):
+    """One replication of a spec; drop-in for the blueprint's run_simulation."""
+    return compile_spec(spec, seed, backend).run()
+
+def run_spec(spec):
+    """
+    Entry point of a compiled model program: runs the replications the
+    runner asks for and prints/writes the KPIs like the blueprint.
+    """
+    spec = validate(spec)
+    lib.run_and_report(functools.partial(simulate, spec), spec["replications"], spec["seed"])
+
+_PROGRAM = '''# Production line compiled from a declarative topology spec (see blueprint/topology.py).
+# Change the line by editing SPEC; the simulation itself is generated from it.
+from blueprint.topology import run_spec
+
+SPEC = {spec}
+
+if __name__ == "__main__":
+    run_spec(SPEC)
+'''
+
+def to_program(spec):
+    """Model program for the pipeline (run_model, adapters, caches) that simulates spec."""
+    return _PROGRAM.format(spec=pprint.pformat(validate(spec), sort_dicts=False, width=110))
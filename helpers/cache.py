@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+class DiskCache:
+    """
+    Content-addressed JSON store on disk.
+
+    Each entry is one file named by its key. The file's mtime is its creation
+    time and its atime the last use, so eviction drops the least recently
+    used entries once max_entries or max_bytes is exceeded; entries older
+    than max_age_s count as misses and are removed.
+    """
+    def __init__(self, directory, max_entries: int | None = None, max_bytes: int | None = None,
+                 max_age_s: float | None = None):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable hash of JSON-serialisable parts."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if self.max_age_s is not None and time.time() - stat.st_mtime > self.max_age_s:
+                path.unlink(missing_ok=True)
+                return None
+            value = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path, (time.time(), stat.st_mtime))   # mark as recently used
+            return value
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # write to a scratch file first so concurrent readers never see half an entry
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_name, path)
+        self.evict()
+
+    def evict(self):
+        if self.max_entries is None and self.max_bytes is None and self.max_age_s is None:
+            return
+        entries = []
+        now = time.time()
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self.max_age_s is not None and now - stat.st_mtime > self.max_age_s:
+                path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        entries.sort(reverse=True)   # most recently used first
+        total_bytes = 0
+        for count, (_, size, path) in enumerate(entries, start=1):
+            total_bytes += size
+            if (self.max_entries is not None and count > self.max_entries) or \
+               (self.max_bytes is not None and total_bytes > self.max_bytes):
+                path.unlink(missing_ok=True)
+
+    def clear(self):
+        for path in self.directory.glob("*/*.json"):
+            path.unlink(missing_ok=True)
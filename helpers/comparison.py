@@ -0,0 +1,103 @@
+import math
+
+# KPIs of a result document that are compared
+KPIS = ("throughput", "wip", "energy_per_part")
+
+def _betacf(a, b, x):
+    # continued fraction of the incomplete beta function (Numerical Recipes, Lentz's method)
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)),
+                   -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-14:
+            break
+    return h
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                     + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+def t_cdf(t, df):
+    """CDF of Student's t distribution with df degrees of freedom."""
+    tail = 0.5 * _betainc(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t > 0 else tail
+
+def t_quantile(p, df):
+    """Inverse of t_cdf, by bisection."""
+    lo, hi = -1e3, 1e3
+    for _ in range(200):
+        mid = (lo + hi) / 2.0
+        if t_cdf(mid, df) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2.0
+
+def replication_kpis(document):
+    """{seed: {kpi: value}} of the replications in a result document."""
+    return {rep["seed"]: {"throughput": rep["overall"]["throughput"], "wip": rep["overall"]["wip"],
+                          "energy_per_part": rep["energy_per_part"]}
+            for rep in document.get("replications", [])}
+
+def common_seeds(baseline, candidate):
+    """Seeds of the replications both result documents have, e.g. none for a document parsed from text."""
+    cand = {rep["seed"] for rep in candidate.get("replications", [])}
+    return [rep["seed"] for rep in baseline.get("replications", []) if rep["seed"] in cand]
+
+def paired_comparison(baseline, candidate, confidence: float = 0.95):
+    """
+    Paired-difference confidence intervals of candidate minus baseline.
+
+    Both are result documents; replications are paired by seed, so with
+    common random numbers (same seeds, per-machine random streams) the noise
+    that both models share cancels out of the differences. Returns per KPI
+    the mean difference, its t-interval, the change in percent of the
+    baseline mean, the number of pairs and whether the interval excludes 0.
+    """
+    base, cand = replication_kpis(baseline), replication_kpis(candidate)
+    seeds = common_seeds(baseline, candidate)
+    if len(seeds) < 2:
+        raise ValueError(f"Paired comparison needs at least 2 replications with common seeds, "
+                         f"got {len(seeds)} ({baseline.get('model')} vs {candidate.get('model')})")
+    n = len(seeds)
+    t = t_quantile(0.5 + confidence / 2.0, n - 1)
+    comparison = {}
+    for kpi in KPIS:
+        diffs = [cand[seed][kpi] - base[seed][kpi] for seed in seeds]
+        mean = sum(diffs) / n
+        sd = math.sqrt(sum((d - mean) ** 2 for d in diffs) / (n - 1))
+        half_width = t * sd / math.sqrt(n)
+        base_mean = sum(base[seed][kpi] for seed in seeds) / n
+        comparison[kpi] = {"mean_diff": mean, "ci_low": mean - half_width, "ci_high": mean + half_width,
+                           "half_width": half_width,
+                           "pct": mean / base_mean * 100.0 if base_mean else float("nan"),
+                           "n": n, "confidence": confidence, "significant": half_width < abs(mean)}
+    return comparison
+
+def format_comparison(comparison, model: str, baseline: str):
+    """Text lines of a paired_comparison, for printing."""
+    confidence = next(iter(comparison.values()))["confidence"]
+    lines = [f"=== Paired comparison: {model} vs {baseline} ({confidence:.0%} CI) ==="]
+    for kpi, c in comparison.items():
+        verdict = "significant" if c["significant"] else "not significant"
+        lines.append(f"{kpi}: {c['mean_diff']:+.4f} [{c['ci_low']:+.4f}, {c['ci_high']:+.4f}] "
+                     f"({c['pct']:+.2f}%, n={c['n']}, {verdict})")
+    return lines
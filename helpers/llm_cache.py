@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+from helpers.cache import DiskCache
+
+CACHE_MODES = ("readwrite", "replay", "off")
+
+class CacheMiss(LookupError):
+    """Raised in replay mode when a request has no cached response."""
+
+class CachedClient:
+    """
+    Drop-in wrapper for the OpenAI client that caches chat completions on disk.
+
+    Responses are keyed by a hash of model name, messages, response_format
+    and any other request arguments. Modes:
+    - "readwrite": answer from the cache, call the API on a miss and store it
+    - "replay": answer only from the cache and raise CacheMiss on a miss;
+      no client is needed, so the pipeline can run offline
+    - "off": always call the API
+    """
+    def __init__(self, client=None, cache_dir=".llm_cache", mode: str = "readwrite",
+                 max_entries: int | None = 5000, max_bytes: int | None = None,
+                 max_age_s: float | None = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.raw = client
+        self.mode = mode
+        self.cache = DiskCache(cache_dir, max_entries=max_entries, max_bytes=max_bytes, max_age_s=max_age_s)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, *, model, messages, response_format=None, **kwargs):
+        if self.mode == "off":
+            return self._call(model, messages, response_format, kwargs)
+        key = DiskCache.key(model, messages, response_format, kwargs)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return _response(entry["content"], entry["model"])
+        if self.mode == "replay":
+            raise CacheMiss(f"No cached response for {model} request {key[:12]}")
+        resp = self._call(model, messages, response_format, kwargs)
+        content = resp.choices[0].message.content
+        if content is not None:
+            self.cache.put(key, {"model": model, "content": content})
+        return resp
+
+    def _call(self, model, messages, response_format, kwargs):
+        if self.raw is None:
+            raise RuntimeError("CachedClient has no API client to forward the request to")
+        if response_format is not None:
+            kwargs = {**kwargs, "response_format": response_format}
+        return self.raw.chat.completions.create(model=model, messages=messages, **kwargs)
+
+def _response(content, model):
+    # just the fields the agents read from a ChatCompletion
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=message)])
+
+def uncached(client):
+    """The client behind a CachedClient, for agents that bypass the cache."""
+    return client.raw if isinstance(client, CachedClient) else client
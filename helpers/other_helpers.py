@@ -1,197 +1,273 @@
-import os
-from helpers.runner import run_python_code
-import re
-import matplotlib.pyplot as plt
-import numpy as np
-
-def save_model(model_content, save_path, filename):
-    full_path = os.path.join(save_path, filename)
-    with open(full_path, 'w', encoding='utf-8') as f:
-        f.write(model_content)
-    print(f"Model saved to {full_path}")
-    return full_path
-
-def retrieve_KPIs(code, modelinfo: str):
-    original_output = run_python_code(code).splitlines()
-    kpi_section = [f"----Results from model: {modelinfo}"]
-    bottleneck_section = []
-    in_bottleneck_block = False
-    for line in original_output:
-        if "=== Bottleneck Frequency over runs ===" in line:
-            in_bottleneck_block = True
-            bottleneck_section.append(line)
-            continue
-        if in_bottleneck_block:
-            bottleneck_section.append(line)
-            continue
-        kpi_section.append(line)
-    return kpi_section, bottleneck_section
-
-def remove_code_wrappers(code):
-    code = code.strip()
-    if code.startswith("```python"):
-        code = code[len("```python"):].strip()
-    if code.endswith("```"):
-        code = code[:-3].strip()
-    return code
-
-def visualize_results(results, save_path: str | None = None):
-    # ---------- regex patterns ----------
-    _RE_NAME   = re.compile(r'^----Results from model:\s*(.*)')
-    _RE_TP     = re.compile(r'^Throughput\s*=\s*([\d.]+)')
-    _RE_WIP    = re.compile(r'^WIP\s*=\s*([\d.]+)')
-    _RE_ENERGY = re.compile(r'^Mean Energy Consumption per Part\s*=\s*([\d.]+)')
-
-    def _extract_kpis(block):
-        """Return (model_name, throughput, WIP, energy) from one text block."""
-        name = tp = wip = energy = None
-        for line in block:
-            if (m := _RE_NAME.match(line)):
-                name = m.group(1)
-            elif (m := _RE_TP.match(line)):
-                tp = float(m.group(1))
-            elif (m := _RE_WIP.match(line)):
-                wip = float(m.group(1))
-            elif (m := _RE_ENERGY.match(line)):
-                energy = float(m.group(1))
-        if None in (name, tp, wip, energy):
-            raise ValueError(f"Incomplete KPI set in block:\n{block}")
-        return name, tp, wip, energy
-
-    def _visualize_values_and_changes(blocks,
-                                      *,
-                                      baseline_index: int = 0,
-                                      annotate: bool = True,
-                                      figsize_per_bar: float = 1.6,
-                                      font_size: int = 9,
-                                      arrow: bool = True):
-        # ----- extract KPIs --------------------------------------------------------
-        names, tp, wip, en = zip(*(_extract_kpis(b) for b in blocks))
-        tp = np.array(tp, dtype=float)
-        wip = np.array(wip, dtype=float)
-        en = np.array(en, dtype=float)
-
-        n_models = len(names)
-        width = max(6, n_models * figsize_per_bar)
-
-        # ----- single figure with grouped bars ------------------------------------
-        fig, ax = plt.subplots(figsize=(width, 7))
-
-        x = np.arange(n_models)   # model positions
-        bar_width = 0.25
-
-        # positions for each KPI
-        x_tp = x - bar_width
-        x_wip = x
-        x_en = x + bar_width
-
-        # new colours + legend wording
-        bars_tp = ax.bar(
-            x_tp, tp,
-            width=bar_width,
-            label="TH (parts/hour)",
-            color="#1F77B4"    # blue
-        )
-        bars_wip = ax.bar(
-            x_wip, wip,
-            width=bar_width,
-            label="WIP (parts)",
-            color="#2B7A0B"    # dark green
-        )
-        bars_en = ax.bar(
-            x_en, en,
-            width=bar_width,
-            label="SEC (kWh/part)",
-            color="#F28E2B"    # dark orange
-        )
-
-        # ----- annotation helper ---------------------------------------------------
-        def annotate_group(bars, values, title):
-            base = values[baseline_index]
-            abs_delta = values - base
-            pct_delta = abs_delta / base * 100.0
-
-            for idx, (bar, val, d, p) in enumerate(zip(bars, values, abs_delta, pct_delta)):
-                x_pos = bar.get_x() + bar.get_width() / 2
-                y_pos = bar.get_height()
-
-                if d > 0:
-                    sign_arrow = "▲"
-                elif d < 0:
-                    sign_arrow = "▼"
-                else:
-                    sign_arrow = "-"
-
-                # colour logic: green good, red bad, neutral for no change
-                if title.startswith("TH"):  # higher TH is better
-                    if d > 0:
-                        colour = "#3cab5c"      # green
-                    elif d < 0:
-                        colour = "#c94c4c"      # red
-                    else:
-                        colour = "#2F4F4F"      # neutral dark slate for no change
-                else:  # WIP or SEC: lower is better
-                    if d > 0:
-                        colour = "#c94c4c"      # red
-                    elif d < 0:
-                        colour = "#3cab5c"      # green
-                    else:
-                        colour = "#2F4F4F"      # neutral dark slate for no change
-
-                # baseline model: only value
-                if idx == baseline_index:
-                    label = f"{val:.2f}"
-                else:
-                    # value, Δ, and % each on their own line
-                    label = (
-                        f"{val:.2f}\n"                        # value
-                        f"{sign_arrow if arrow else ''}{d:+.2f}\n"  # delta
-                        f"({p:+.1f}%)"                       # percentage
-                    )
-
-                ax.text(
-                    x_pos, y_pos, label,
-                    ha="center", va="bottom",
-                    fontsize=font_size,
-                    color=colour,
-                    fontweight="bold",
-                    linespacing=1.3
-                )
-
-        # ----- annotations & styling ----------------------------------------------
-        if annotate:
-            # headroom for labels
-            max_val = max(tp.max(), wip.max(), en.max())
-            ax.set_ylim(top=max_val * 1.25)
-
-            annotate_group(bars_tp, tp,  "TH (parts/hour)")
-            annotate_group(bars_wip, wip, "WIP (parts)")
-            annotate_group(bars_en, en,  "SEC (kWh/part)")
-
-        ax.set_title("KPIs per model – values and Δ vs baseline")
-        ax.set_ylabel("Value")
-        ax.set_xlabel("Model version")
-
-        ax.set_xticks(x)
-        ax.set_xticklabels(names)
-        ax.tick_params(axis="x", rotation=45)
-        for lbl in ax.get_xticklabels():
-            lbl.set_ha("right")
-
-        ax.legend()
-        ax.margins(x=0.05)
-        fig.tight_layout()
-
-        return fig
-
-    # create figure
-    fig = _visualize_values_and_changes(results)
-
-    # save if a path is provided
-    if save_path is not None:
-        full_path = os.path.join(save_path, "model_comparison_kpis.png")
-        fig.savefig(full_path, dpi=300, bbox_inches="tight")
-        plt.close(fig)
-        print(f"\nFigure saved to {full_path}")
-
+import os
+import sys
+from helpers.sim_cache import get_simulation_cache
+from helpers.runner import run_model, seed_env, precision_env
+from helpers.comparison import common_seeds, paired_comparison
+import re
+
+def pyplot():
+    """
+    matplotlib.pyplot, imported on first use.
+
+    Without a display (no DISPLAY/WAYLAND_DISPLAY on Linux) and no
+    MPLBACKEND set, the non-interactive Agg backend is selected, so
+    headless runs do not probe GUI toolkits.
+    """
+    if "matplotlib.pyplot" not in sys.modules and not os.environ.get("MPLBACKEND") \
+       and sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+        import matplotlib
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def save_model(model_content, save_path, filename):
+    full_path = os.path.join(save_path, filename)
+    with open(full_path, 'w', encoding='utf-8') as f:
+        f.write(model_content)
+    print(f"Model saved to {full_path}")
+    return full_path
+
+# patterns of the printed KPI block, only used for models without a result document
+_RE_RUNS   = re.compile(r'Mean Overall KPIs over\s*(\d+)\s*runs')
+_RE_TP     = re.compile(r'^Throughput\s*=\s*([\d.]+)')
+_RE_WIP    = re.compile(r'^WIP\s*=\s*([\d.]+)')
+_RE_ENERGY = re.compile(r'^Mean Energy Consumption per Part\s*=\s*([\d.]+)')
+_RE_BOTTLENECK = re.compile(r'^(.+?):\s*(\d+)\s*times')
+
+def _parse_kpi_text(output):
+    """Build a minimal result document from printed output (older generated models)."""
+    runs = None
+    summary = {}
+    bottleneck_frequency = {}
+    in_bottleneck_block = False
+    for line in output.splitlines():
+        line = line.strip()
+        if "=== Bottleneck Frequency over runs ===" in line:
+            in_bottleneck_block = True
+        elif in_bottleneck_block and (m := _RE_BOTTLENECK.match(line)):
+            bottleneck_frequency[m.group(1)] = int(m.group(2))
+        elif (m := _RE_RUNS.search(line)):
+            runs = int(m.group(1))
+        elif (m := _RE_TP.match(line)):
+            summary["throughput"] = float(m.group(1))
+        elif (m := _RE_WIP.match(line)):
+            summary["wip"] = float(m.group(1))
+        elif (m := _RE_ENERGY.match(line)):
+            summary["energy_per_part"] = float(m.group(1))
+    return {"runs": runs, "seeds": [], "summary": summary,
+            "bottleneck_frequency": bottleneck_frequency, "replications": []}
+
+def retrieve_KPIs(code, modelinfo: str, use_cache: bool = True, seeds=None, target_half_width=None):
+    """
+    Simulate a model and return (kpis, bottleneck_section).
+
+    kpis is the model's JSON result document tagged with modelinfo under
+    "model"; bottleneck_section is the bottleneck frequency as text lines.
+    seeds fixes the replication seeds, so models simulated with the same
+    seeds can be compared pairwise. With target_half_width the model runs
+    replications (in seeds order, if given) only until throughput and energy
+    per part reach that relative 95% CI half-width. Identical models are
+    only simulated once unless use_cache=False.
+    """
+    env = {**seed_env(seeds), **precision_env(target_half_width)} or None
+    if use_cache:
+        output, document = get_simulation_cache().run(code, env=env)
+    else:
+        output, document = run_model(code, env=env)
+    if document is None:
+        document = _parse_kpi_text(output)
+    kpis = {"model": modelinfo, **document}
+    bottleneck_section = ["=== Bottleneck Frequency over runs ==="]
+    bottleneck_section += [f"{machine}: {count} times"
+                           for machine, count in document["bottleneck_frequency"].items()]
+    if document.get("routing"):
+        # how Splitters/Mergers spread the parts, e.g. an idle parallel branch
+        bottleneck_section.append("=== Routing over runs ===")
+        bottleneck_section += [f"{name} ({entry['policy']}): "
+                               + ", ".join(f"{label} {share:.1%}" for label, share in entry["shares"].items())
+                               for name, entry in document["routing"].items()]
+    return kpis, bottleneck_section
+
+def format_kpis(kpis):
+    """Text lines with the mean KPIs of one result document, for printing."""
+    summary = kpis["summary"]
+    return [f"----Results from model: {kpis['model']}",
+            f"=== Mean Overall KPIs over {kpis['runs']} runs ===",
+            f"Throughput = {summary['throughput']:.2f} parts/hour",
+            f"WIP = {summary['wip']:.2f} parts",
+            f"Mean Energy Consumption per Part = {summary['energy_per_part']:.4f} kWh/part"]
+
+def remove_code_wrappers(code):
+    code = code.strip()
+    if code.startswith("```python"):
+        code = code[len("```python"):].strip()
+    if code.endswith("```"):
+        code = code[:-3].strip()
+    return code
+
+def visualize_results(results, save_path: str | None = None, paired: bool = False):
+    """
+    Bar chart of the KPIs of all models with their change vs the first one.
+
+    With paired=True (all models simulated with the same seeds) each change
+    is annotated with its paired-difference 95% confidence interval, and
+    changes whose interval includes 0 are drawn in the neutral colour.
+    """
+    import numpy as np
+    plt = pyplot()
+    # models without per-replication data (e.g. parsed from printed text) get the unpaired annotation
+    comparisons = [paired_comparison(results[0], r) if paired and i and len(common_seeds(results[0], r)) >= 2 else None
+                   for i, r in enumerate(results)]
+
+    def _extract_kpis(kpis):
+        """Return (model_name, throughput, WIP, energy) from one result document."""
+        summary = kpis["summary"]
+        try:
+            return kpis["model"], summary["throughput"], summary["wip"], summary["energy_per_part"]
+        except KeyError as e:
+            raise ValueError(f"Incomplete KPI set for model {kpis.get('model')}: missing {e}")
+
+    def _visualize_values_and_changes(blocks,
+                                      *,
+                                      baseline_index: int = 0,
+                                      annotate: bool = True,
+                                      figsize_per_bar: float = 1.6,
+                                      font_size: int = 9,
+                                      arrow: bool = True):
+        # ----- extract KPIs --------------------------------------------------------
+        names, tp, wip, en = zip(*(_extract_kpis(b) for b in blocks))
+        tp = np.array(tp, dtype=float)
+        wip = np.array(wip, dtype=float)
+        en = np.array(en, dtype=float)
+
+        n_models = len(names)
+        width = max(6, n_models * figsize_per_bar)
+
+        # ----- single figure with grouped bars ------------------------------------
+        fig, ax = plt.subplots(figsize=(width, 7))
+
+        x = np.arange(n_models)   # model positions
+        bar_width = 0.25
+
+        # positions for each KPI
+        x_tp = x - bar_width
+        x_wip = x
+        x_en = x + bar_width
+
+        # new colours + legend wording
+        bars_tp = ax.bar(
+            x_tp, tp,
+            width=bar_width,
+            label="TH (parts/hour)",
+            color="#1F77B4"    # blue
+        )
+        bars_wip = ax.bar(
+            x_wip, wip,
+            width=bar_width,
+            label="WIP (parts)",
+            color="#2B7A0B"    # dark green
+        )
+        bars_en = ax.bar(
+            x_en, en,
+            width=bar_width,
+            label="SEC (kWh/part)",
+            color="#F28E2B"    # dark orange
+        )
+
+        # ----- annotation helper ---------------------------------------------------
+        def annotate_group(bars, values, title, kpi):
+            base = values[baseline_index]
+            abs_delta = values - base
+            pct_delta = abs_delta / base * 100.0
+
+            for idx, (bar, val, d, p) in enumerate(zip(bars, values, abs_delta, pct_delta)):
+                x_pos = bar.get_x() + bar.get_width() / 2
+                y_pos = bar.get_height()
+                ci = comparisons[idx][kpi] if comparisons[idx] else None
+                if ci is not None:
+                    d, p = ci["mean_diff"], ci["pct"]   # Δ over the common seeds, like its CI
+
+                if d > 0:
+                    sign_arrow = "▲"
+                elif d < 0:
+                    sign_arrow = "▼"
+                else:
+                    sign_arrow = "-"
+
+                # colour logic: green good, red bad, neutral for no change
+                if title.startswith("TH"):  # higher TH is better
+                    if d > 0:
+                        colour = "#3cab5c"      # green
+                    elif d < 0:
+                        colour = "#c94c4c"      # red
+                    else:
+                        colour = "#2F4F4F"      # neutral dark slate for no change
+                else:  # WIP or SEC: lower is better
+                    if d > 0:
+                        colour = "#c94c4c"      # red
+                    elif d < 0:
+                        colour = "#3cab5c"      # green
+                    else:
+                        colour = "#2F4F4F"      # neutral dark slate for no change
+                if ci is not None and not ci["significant"]:
+                    colour = "#2F4F4F"          # change within the noise
+
+                # baseline model: only value
+                if idx == baseline_index:
+                    label = f"{val:.2f}"
+                else:
+                    # value, Δ, and % each on their own line
+                    label = (
+                        f"{val:.2f}\n"                        # value
+                        f"{sign_arrow if arrow else ''}{d:+.2f}\n"  # delta
+                        f"({p:+.1f}%)"                       # percentage
+                    )
+                    if ci is not None:
+                        label += f"\n±{ci['half_width']:.2f}"    # paired 95% CI half-width
+
+                ax.text(
+                    x_pos, y_pos, label,
+                    ha="center", va="bottom",
+                    fontsize=font_size,
+                    color=colour,
+                    fontweight="bold",
+                    linespacing=1.3
+                )
+
+        # ----- annotations & styling ----------------------------------------------
+        if annotate:
+            # headroom for labels
+            max_val = max(tp.max(), wip.max(), en.max())
+            ax.set_ylim(top=max_val * (1.35 if paired else 1.25))
+
+            annotate_group(bars_tp, tp,  "TH (parts/hour)", "throughput")
+            annotate_group(bars_wip, wip, "WIP (parts)", "wip")
+            annotate_group(bars_en, en,  "SEC (kWh/part)", "energy_per_part")
+
+        ax.set_title("KPIs per model – values and Δ vs baseline")
+        ax.set_ylabel("Value")
+        ax.set_xlabel("Model version")
+
+        ax.set_xticks(x)
+        ax.set_xticklabels(names)
+        ax.tick_params(axis="x", rotation=45)
+        for lbl in ax.get_xticklabels():
+            lbl.set_ha("right")
+
+        ax.legend()
+        ax.margins(x=0.05)
+        fig.tight_layout()
+
+        return fig
+
+    # create figure
+    fig = _visualize_values_and_changes(results)
+
+    # save if a path is provided
+    if save_path is not None:
+        full_path = os.path.join(save_path, "model_comparison_kpis.png")
+        fig.savefig(full_path, dpi=300, bbox_inches="tight")
+        plt.close(fig)
+        print(f"\nFigure saved to {full_path}")
+
     return fig
\ No newline at end of file
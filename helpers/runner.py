@@ -1,29 +1,275 @@
-import subprocess, sys, tempfile, textwrap
-from pathlib import Path
-
-def run_python_code(code_str: str, timeout = 300):
-    # Write the generated code to a scratch file
-    with tempfile.NamedTemporaryFile(mode="w",
-                                     delete=False,
-                                     suffix=".py",
-                                     encoding="utf-8") as tmp:
-        tmp.write(textwrap.dedent(code_str))
-        tmp_path: Path = Path(tmp.name)
-
-    # Launch a new interpreter so the code runs in isolation
-    result = subprocess.run(
-        [sys.executable, str(tmp_path)],
-        capture_output=True,
-        text=True,
-        timeout=timeout
-    )
-    # check if things go well and delete the file if it does.
-    if result.returncode == 0:
-        try:
-            tmp_path.unlink()
-        except FileNotFoundError:
-            pass
-    if result.returncode != 0:
-        raise RuntimeError(
-            f"{tmp_path} exited {result.returncode}:\n{result.stderr}")
-    return result.stdout
\ No newline at end of file
+import subprocess, sys, tempfile, textwrap, os, json
+import atexit, io, queue, signal, threading, traceback, types
+import multiprocessing as mp
+import multiprocessing.util   # registers its atexit join first, so SimulationPool.close runs before it
+from contextlib import redirect_stdout, redirect_stderr
+from pathlib import Path
+
+def run_python_code(code_str: str, timeout = 300):
+    # Write the generated code to a scratch file
+    with tempfile.NamedTemporaryFile(mode="w",
+                                     delete=False,
+                                     suffix=".py",
+                                     encoding="utf-8") as tmp:
+        tmp.write(textwrap.dedent(code_str))
+        tmp_path: Path = Path(tmp.name)
+
+    # Launch a new interpreter so the code runs in isolation
+    try:
+        result = subprocess.run(
+            [sys.executable, str(tmp_path)],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+    finally:
+        # the scratch file is removed whether the run succeeds, fails or times out
+        tmp_path.unlink(missing_ok=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"{tmp_path} exited {result.returncode}:\n{result.stderr}")
+    return result.stdout
+
+def _rss_mb():
+    # current resident set size; falls back to the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def _execute(code_str, env):
+    """Execute model source as __main__ and return (exit code, stdout, stderr)."""
+    module = types.ModuleType("__main__")
+    module.__file__ = "<model>"
+    saved_main = sys.modules["__main__"]
+    saved_env = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    # the model's own replication pool pickles functions as __main__.<name>
+    sys.modules["__main__"] = module
+    stdout, stderr = io.StringIO(), io.StringIO()
+    exit_code = 0
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            exec(compile(textwrap.dedent(code_str), "<model>", "exec"), module.__dict__)
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if e.code is not None and not isinstance(e.code, int):
+            stderr.write(f"{e.code}\n")
+    except BaseException:
+        exit_code = 1
+        stderr.write(traceback.format_exc())
+    finally:
+        sys.modules["__main__"] = saved_main
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return exit_code, stdout.getvalue(), stderr.getvalue()
+
+def _worker_main(conn, max_memory_mb):
+    # own process group, so a timeout can kill the model's replication pool too
+    if hasattr(os, "setsid"):
+        os.setsid()
+    # pre-warm what every generated model imports
+    import simpy, random, statistics, numpy
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        code_str, env = job
+        exit_code, stdout, stderr = _execute(code_str, env)
+        recycle = max_memory_mb is not None and _rss_mb() > max_memory_mb
+        conn.send((exit_code, stdout, stderr, recycle))
+        if recycle:
+            return
+
+class _Worker:
+    def __init__(self, ctx, max_memory_mb):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, max_memory_mb))
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def kill(self):
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)   # the worker leaves its loop
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+class SimulationPool:
+    """
+    Persistent pool of pre-warmed worker processes that execute model source.
+
+    Each worker has simpy, random, statistics and numpy imported already and runs
+    submitted code as __main__. A worker is replaced after a crash, a timeout,
+    when its memory exceeds max_memory_mb, or after max_jobs_per_worker runs.
+    At most `workers` models run at the same time; run() is thread-safe.
+    Create the pool before starting threads: its workers are forked then, and
+    replacements are started through a fork server.
+    """
+    def __init__(self, workers: int = 1, max_memory_mb: float | None = 2048,
+                 max_jobs_per_worker: int | None = None, replication_workers: int | None = None):
+        self.workers = max(1, workers)
+        self.max_memory_mb = max_memory_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        # split the cores between concurrently running models
+        self.replication_workers = replication_workers or max(1, (os.cpu_count() or 1) // self.workers)
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context("fork" if "fork" in methods else "spawn")
+        # replacements start while other threads (LLM requests, simulations) run, where fork() is unsafe
+        self._replacement_ctx = mp.get_context("forkserver") if "forkserver" in methods else self._ctx
+        if self._replacement_ctx is not self._ctx:
+            self._replacement_ctx.set_forkserver_preload(["helpers.runner", "simpy", "numpy"])
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._closed = False
+        # all workers are forked now, before the caller starts any threads
+        for _ in range(self.workers):
+            self._idle.put(self._start_worker(self._ctx))
+
+    def _start_worker(self, ctx):
+        worker = _Worker(ctx, self.max_memory_mb)
+        with self._lock:
+            self._all.add(worker)
+        return worker
+
+    def _discard(self, worker, kill=False):
+        with self._lock:
+            self._all.discard(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def run(self, code_str: str, timeout = 300, env: dict | None = None):
+        """Execute model source in a warm worker and return its stdout."""
+        if self._closed:
+            raise RuntimeError("SimulationPool is closed")
+        env = {"DES_WORKERS": str(self.replication_workers), **(env or {})}
+        worker = self._idle.get()
+        try:
+            if worker is None or not worker.process.is_alive():
+                worker = self._start_worker(self._replacement_ctx)
+            worker.conn.send((code_str, env))
+            if not worker.conn.poll(timeout):
+                self._discard(worker, kill=True)
+                worker = None
+                raise subprocess.TimeoutExpired("<model>", timeout)
+            try:
+                exit_code, stdout, stderr, recycle = worker.conn.recv()
+            except EOFError:
+                worker.process.join(timeout=1)
+                exit_code = worker.process.exitcode
+                self._discard(worker, kill=True)
+                worker = None
+                raise RuntimeError(f"Model worker crashed (exit code {exit_code})")
+            worker.jobs += 1
+            if recycle or (self.max_jobs_per_worker and worker.jobs >= self.max_jobs_per_worker):
+                self._discard(worker)
+                worker = None
+        finally:
+            self._idle.put(worker)
+        if exit_code != 0:
+            raise RuntimeError(f"Model exited {exit_code}:\n{stderr}")
+        return stdout
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            workers = list(self._all)
+            self._all.clear()
+        for worker in workers:
+            worker.stop()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool(**kwargs):
+    """Shared SimulationPool, created on first use (call it before starting threads); kwargs only apply then."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SimulationPool(**kwargs)
+            atexit.register(_pool.close)
+        return _pool
+
+def seed_env(seeds):
+    """Environment that makes a model run exactly these replication seeds (DES_SEEDS)."""
+    return {"DES_SEEDS": ",".join(str(int(seed)) for seed in seeds)} if seeds else {}
+
+def precision_env(target_half_width, min_replications=None, max_replications=None):
+    """
+    Environment for an adaptive replication count: the model stops once the
+    relative 95% CI half-width of throughput and energy per part is at most
+    target_half_width (DES_TARGET_HALF_WIDTH, DES_MIN/MAX_REPLICATIONS).
+    """
+    if not target_half_width:
+        return {}
+    env = {"DES_TARGET_HALF_WIDTH": str(target_half_width)}
+    if min_replications:
+        env["DES_MIN_REPLICATIONS"] = str(int(min_replications))
+    if max_replications:
+        env["DES_MAX_REPLICATIONS"] = str(int(max_replications))
+    return env
+
+def _pythonpath():
+    # models import blueprint.des_lib (or blueprint.topology, if compiled from a spec) from the project root
+    root = str(Path(__file__).resolve().parents[1])
+    return os.pathsep.join(filter(None, (root, os.environ.get("PYTHONPATH"))))
+
+def run_model(code_str: str, timeout = 300, isolated: bool = False, env: dict | None = None):
+    """
+    Run a generated model and collect its JSON result document.
+
+    The model writes the document to the path in DES_RESULT_FILE; returns
+    (stdout, document), with document None if the model did not write one.
+    Runs in the shared warm pool unless isolated=True, which starts a fresh
+    interpreter instead. env holds extra environment variables for the model.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result_path = Path(tmp_dir) / "result.json"
+        env = {**(env or {}), "DES_RESULT_FILE": str(result_path)}
+        if isolated:
+            tmp_path = Path(tmp_dir) / "model.py"
+            tmp_path.write_text(textwrap.dedent(code_str), encoding="utf-8")
+            result = subprocess.run(
+                [sys.executable, str(tmp_path)],
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                env={**os.environ, **env, "PYTHONPATH": _pythonpath()}
+            )
+            if result.returncode != 0:
+                raise RuntimeError(
+                    f"Model exited {result.returncode}:\n{result.stderr}")
+            stdout = result.stdout
+        else:
+            stdout = get_pool().run(code_str, timeout=timeout, env=env)
+        document = None
+        if result_path.exists():
+            document = json.loads(result_path.read_text(encoding="utf-8"))
+    return stdout, document
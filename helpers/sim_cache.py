@@ -0,0 +1,113 @@
+import ast
+import hashlib
+import io
+import operator
+import threading
+import tokenize
+from pathlib import Path
+from helpers.cache import DiskCache
+from helpers.runner import run_model
+
+# module-level settings of a generated model that change its results
+RUN_SETTINGS = ("RANDOM_SEED", "REPLICATIONS", "SIM_TIME", "WARMUP_SECONDS", "MEASURE_UNTIL")
+
+# model programs that import from here (e.g. compiled topology specs) depend on its sources
+_LIBRARY_DIR = Path(__file__).resolve().parents[1] / "blueprint"
+
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+def normalize_source(code: str) -> str:
+    """Source reduced to its tokens: comments, blank lines and spacing do not matter."""
+    try:
+        tokens = tokenize.generate_tokens(io.StringIO(code).readline)
+        return " ".join(tok.string if tok.type != tokenize.NEWLINE else "\n"
+                        for tok in tokens if tok.type not in _SKIPPED_TOKENS)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return code.strip()
+
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+              ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv}
+
+def _constant(node, known):
+    # numbers, names of settings seen before and arithmetic on them, e.g. 3600 * 24 * 30
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.Name) and isinstance(known.get(node.id), (int, float)):
+        return known[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _constant(node.left, known), _constant(node.right, known)
+        if left is not None and right is not None:
+            try:
+                return _OPERATORS[type(node.op)](left, right)
+            except ArithmeticError:
+                return None
+    return None
+
+def run_settings(code: str) -> dict:
+    """Seed, replication count, SIM_TIME and warm-up as assigned at module level."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return {}
+    settings = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+           and node.targets[0].id in RUN_SETTINGS:
+            value = _constant(node.value, settings)
+            settings[node.targets[0].id] = value if value is not None else ast.unparse(node.value)
+    return settings
+
+def library_digest(code: str):
+    """Hash of the blueprint/ sources if the model imports from blueprint, else None."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    modules = [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+    modules += [node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom) and node.module]
+    if not any(module == "blueprint" or module.startswith("blueprint.") for module in modules):
+        return None
+    # all of them, as the modules import each other (the blueprint and topology.py use des_lib.py)
+    digest = hashlib.sha256()
+    for path in sorted(_LIBRARY_DIR.glob("*.py")):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return digest.hexdigest()
+
+class SimulationCache:
+    """
+    Memoizes run_model on disk.
+
+    The key is a hash of the normalized model source, its seed, replication
+    count, SIM_TIME and warm-up, plus any environment overrides that change
+    the results and, for models importing from blueprint/, its sources. Entries are evicted least recently used beyond max_entries.
+    """
+    def __init__(self, cache_dir=".sim_cache", max_entries: int | None = 500):
+        self.cache = DiskCache(cache_dir, max_entries=max_entries)
+
+    def key(self, code: str, env: dict | None = None) -> str:
+        parts = [normalize_source(code), run_settings(code), env or {}]
+        digest = library_digest(code)
+        if digest:
+            parts.append(digest)   # keys of self-contained models stay as they were
+        return DiskCache.key(*parts)
+
+    def run(self, code: str, timeout = 300, env: dict | None = None):
+        """Same as run_model, but repeated runs of the same model come from the cache."""
+        key = self.key(code, env)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry["stdout"], entry["document"]
+        stdout, document = run_model(code, timeout=timeout, env=env)
+        self.cache.put(key, {"stdout": stdout, "document": document})
+        return stdout, document
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_simulation_cache(**kwargs):
+    """Shared SimulationCache, created on first use; kwargs only apply then."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SimulationCache(**kwargs)
+        return _cache
@@ -0,0 +1,173 @@
+"""
+Surrogate of the simulation KPIs, fitted to the rows of a sweep table (helpers/sweep.py).
+
+A Gaussian process per KPI predicts throughput, WIP and energy per part
+of a parameter configuration with a standard deviation, in far less time
+than a simulation. Surrogate.screen() uses it to decide which proposed
+parameter changes are worth a full simulation.
+"""
+import csv
+import itertools
+import math
+from pathlib import Path
+from helpers.comparison import KPIS
+
+def normal_cdf(z):
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+class GaussianProcess:
+    """
+    Gaussian-process regression with an RBF kernel on inputs scaled to [0, 1].
+
+    The length scale and noise level are picked from a small grid by the
+    log marginal likelihood; targets are standardised.
+    """
+    def fit(self, X, y):
+        import numpy as np
+        self.X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean, self.scale = y.mean(), y.std() or 1.0
+        z = (y - self.mean) / self.scale
+        best = None
+        for length, noise in itertools.product((0.1, 0.2, 0.4, 0.8, 1.6), (1e-6, 1e-3, 1e-2, 1e-1)):
+            K = self._kernel(self.X, self.X, length) + noise * np.eye(len(z))
+            try:
+                L = np.linalg.cholesky(K)
+            except np.linalg.LinAlgError:
+                continue
+            alpha = np.linalg.solve(L.T, np.linalg.solve(L, z))
+            likelihood = -0.5 * z @ alpha - np.log(np.diag(L)).sum()
+            if best is None or likelihood > best[0]:
+                best = (likelihood, length, L, alpha)
+        _, self.length, self.L, self.alpha = best
+        return self
+
+    @staticmethod
+    def _kernel(A, B, length):
+        import numpy as np
+        d2 = ((A[:, None, :] - B[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * d2 / length ** 2)
+
+    def predict(self, X):
+        """Predicted mean and standard deviation at the rows of X."""
+        import numpy as np
+        X = np.asarray(X, dtype=float)
+        Ks = self._kernel(X, self.X, self.length)
+        mean = Ks @ self.alpha
+        v = np.linalg.solve(self.L, Ks.T)
+        var = np.clip(1.0 - (v ** 2).sum(axis=0), 1e-12, None)
+        return self.mean + self.scale * mean, self.scale * np.sqrt(var)
+
+def expected_improvement(mean, std, best):
+    # for maximisation
+    import numpy as np
+    z = (mean - best) / std
+    cdf = 0.5 * (1.0 + np.array([math.erf(v / math.sqrt(2.0)) for v in z]))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2.0 * math.pi)
+    return (mean - best) * cdf + std * pdf
+
+class Surrogate:
+    """
+    KPI predictions for parameter configurations of one model.
+
+    names are the swept parameters (the inputs of the Gaussian processes);
+    every other parameter is assumed to be at its baseline value, which is
+    its value in the model source.
+    """
+    def __init__(self, baseline: dict, names, rows):
+        import numpy as np
+        self.baseline = baseline
+        self.names = list(names)
+        X = np.array([[row.get(name, baseline[name]) for name in self.names] for row in rows], dtype=float)
+        self.low, self.high = X.min(axis=0), X.max(axis=0)
+        self.span = np.where(self.high > self.low, self.high - self.low, 1.0)
+        self.models = {kpi: GaussianProcess().fit(self._scale(X), [row[kpi] for row in rows]) for kpi in KPIS}
+        self.size = len(rows)
+
+    @classmethod
+    def from_table(cls, path, code: str):
+        """Surrogate fitted to the successful rows of a sweep CSV of the model code."""
+        from helpers.sweep import model_parameters
+        parameters = model_parameters(code)
+        with open(Path(path), newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            names = [name for name in reader.fieldnames or [] if name in parameters]
+            rows = []
+            for row in reader:
+                if row.get("error") or any(row[kpi] in ("", "nan") for kpi in KPIS):
+                    continue
+                rows.append({name: float(row[name]) for name in names + list(KPIS) if row[name] != ""})
+        if len(rows) < 2:
+            raise ValueError(f"{path} has {len(rows)} successful sweep rows; the surrogate needs at least 2")
+        return cls({name: parameter.value for name, parameter in parameters.items()}, names, rows)
+
+    def _scale(self, X):
+        return (X - self.low) / self.span
+
+    def predict(self, points):
+        """{kpi: (means, stds)} for a list of {name: value} changes to the baseline."""
+        import numpy as np
+        X = np.array([[point.get(name, self.baseline[name]) for name in self.names] for point in points], dtype=float)
+        return {kpi: model.predict(self._scale(X)) for kpi, model in self.models.items()}
+
+    def screen(self, changes, objective: str = "throughput", maximize: bool = True,
+               min_probability: float = 0.2, max_uncertainty: float = 0.02):
+        """
+        Decide which proposed changes deserve a full simulation.
+
+        changes is a list of {parameter: value} (one per proposal, empty if
+        it cannot be expressed as parameter values). A proposal is kept if
+        the surrogate cannot judge it (no or unknown parameters, parameters
+        the sweep did not vary, values outside the swept range), if its
+        probability to beat the baseline on objective is at least
+        min_probability, or if its predicted objective is uncertain by more
+        than max_uncertainty relative to the baseline. Returns one dict per
+        proposal with "simulate", "reason" and, where judged, "prediction"
+        {kpi: (mean, std)}.
+        """
+        base = self.predict([{}])[objective][0][0]
+        decisions = []
+        for change in changes:
+            try:
+                change = {name: float(value) for name, value in (change or {}).items()}
+            except (AttributeError, TypeError, ValueError):
+                decisions.append({"simulate": True, "reason": f"not parameter values: {change!r}"})
+                continue
+            unknown = [name for name in change if name not in self.baseline]
+            unswept = [name for name in change if name in self.baseline and name not in self.names
+                       and change[name] != self.baseline[name]]
+            outside = [name for name in change if name in self.names
+                       and not self.low[self.names.index(name)] <= change[name] <= self.high[self.names.index(name)]]
+            if not change:
+                decisions.append({"simulate": True, "reason": "no parameter values"})
+            elif unknown or unswept or outside:
+                problem = (f"unknown parameters {unknown}" if unknown else
+                           f"not varied in the sweep: {unswept}" if unswept else f"outside the swept range: {outside}")
+                decisions.append({"simulate": True, "reason": problem})
+            else:
+                predicted = self.predict([change])
+                prediction = {kpi: (float(means[0]), float(stds[0])) for kpi, (means, stds) in predicted.items()}
+                mean, std = prediction[objective]
+                gain = (mean - base) if maximize else (base - mean)
+                probability = normal_cdf(gain / std)
+                uncertainty = std / abs(base) if base else math.inf
+                if probability >= min_probability:
+                    reason = f"promising, P(better {objective}) = {probability:.2f}"
+                elif uncertainty > max_uncertainty:
+                    reason = f"uncertain, +/-{uncertainty:.1%} {objective}"
+                else:
+                    reason = f"screened out, P(better {objective}) = {probability:.2f}"
+                decisions.append({"simulate": probability >= min_probability or uncertainty > max_uncertainty,
+                                  "reason": reason, "prediction": prediction})
+        return decisions
+
+def format_screening(instructions, decisions):
+    """Text lines of a screening result, one per instruction."""
+    lines = ["=== Surrogate screening ==="]
+    for instruction, decision in zip(instructions, decisions):
+        mark = "simulate" if decision["simulate"] else "skip"
+        lines.append(f"[{mark}] {instruction}: {decision['reason']}")
+        if "prediction" in decision:
+            lines.append("    predicted " + ", ".join(f"{kpi} {mean:.4g} +/- {std:.2g}"
+                                                    for kpi, (mean, std) in decision["prediction"].items()))
+    return lines
@@ -0,0 +1,390 @@
+"""
+Design-space sweeps over the numeric parameters of a generated model.
+
+    python -m helpers.sweep results/initial_model.py --list
+    python -m helpers.sweep results/initial_model.py --grid buffer1.capacity=1:10 buffer2.capacity=1:10 --out sweep.csv
+    python -m helpers.sweep results/initial_model.py --lhs 500 --bounds M2.process_time=15:25 buffer1.capacity=1:10
+    python -m helpers.sweep results/initial_model.py --bo 60 --bounds buffer1.capacity=1:10 --objective throughput
+
+Capacities, delays, process times, availabilities and MTTRs are read from
+the model source (blueprint-style constructor calls or a topology SPEC)
+and substituted in place, so every configuration is the original model
+with other numbers and no LLM call is needed. Configurations run
+concurrently on the warm simulation pool and every finished one is
+appended to a CSV table right away; rerunning the same sweep with the same
+--out skips the configurations already in the table.
+"""
+import argparse
+import ast
+import csv
+import itertools
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from helpers.comparison import KPIS
+from helpers.other_helpers import retrieve_KPIs
+from helpers.runner import get_pool
+from helpers.sim_cache import RUN_SETTINGS
+from helpers.surrogate import GaussianProcess, expected_improvement
+
+# positional parameters of the blueprint constructors, and the swept ones under their sweep names
+_SIGNATURES = {
+    "DelayBuffer": ("env", "cap", "delay"),
+    "Store": ("env", "capacity"),
+    "Machine": ("env", "name", "input_buffer", "output_buffer", "process_time", "availability", "mttr",
+                "working_power", "waiting_power", "defect_rate", "defect_sink", "capacity"),
+    "Merger": ("env", "name", "output_buffer", "inputs", "capacity"),
+}
+_SWEPT = {"cap": "capacity", "capacity": "capacity", "delay": "delay", "process_time": "process_time",
+          "availability": "availability", "mttr": "mttr"}
+# the same fields in a topology SPEC
+_SPEC_FIELDS = {"buffers": ("capacity", "delay"), "machines": ("process_time", "availability", "mttr", "capacity")}
+_SPEC_SETTINGS = ("sim_time", "warmup", "measure_until", "replications", "seed")
+_INTEGER = ("capacity", "REPLICATIONS", "RANDOM_SEED", "replications", "seed")
+
+class Parameter:
+    """A numeric literal of the model that can be swept: its name, value and position in the source."""
+    __slots__ = ("name", "value", "integer", "node")
+
+    def __init__(self, name, node):
+        self.name = name
+        self.node = node
+        self.value = eval(compile(ast.Expression(node), "<parameter>", "eval"), {})
+        self.integer = name.rsplit(".", 1)[-1] in _INTEGER
+
+    def __repr__(self):
+        return f"Parameter({self.name}={self.value!r})"
+
+def _number(node):
+    # numeric literal, including a negative one
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return _number(node.operand) and node
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node
+    return None
+
+def _arithmetic(node):
+    # literal arithmetic such as 3600 * 24 * 30, as run settings are often written
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+        return _arithmetic(node.left) and _arithmetic(node.right) and node
+    return _number(node)
+
+def _string(node):
+    return node.value if isinstance(node, ast.Constant) and isinstance(node.value, str) else None
+
+def _call_parameters(call, target):
+    func = call.func.attr if isinstance(call.func, ast.Attribute) else getattr(call.func, "id", None)
+    if func not in _SIGNATURES:
+        return []
+    names = _SIGNATURES[func]
+    args = dict(zip(names, call.args))
+    args.update({kw.arg: kw.value for kw in call.keywords if kw.arg})
+    # machines and mergers are named by their name argument, buffers by the variable they are assigned to
+    component = _string(args.get("name")) or target
+    if component is None:
+        return []
+    return [(f"{component}.{_SWEPT[arg]}", node) for arg, node in args.items()
+            if arg in _SWEPT and _number(node)]
+
+def _spec_parameters(spec):
+    found = []
+    for key, value in zip(spec.keys, spec.values):
+        key = _string(key)
+        if key in _SPEC_SETTINGS and _number(value):
+            found.append((key, value))
+        elif key == "source" and isinstance(value, ast.Dict):
+            found += [(f"source.{_string(k)}", v) for k, v in zip(value.keys, value.values)
+                      if _string(k) == "interarrival" and _number(v)]
+        elif key in _SPEC_FIELDS and isinstance(value, ast.List):
+            for item in value.elts:
+                if not isinstance(item, ast.Dict):
+                    continue
+                fields = {_string(k): v for k, v in zip(item.keys, item.values)}
+                name = _string(fields.get("name"))
+                found += [(f"{name}.{field}", fields[field]) for field in _SPEC_FIELDS[key]
+                          if name and field in fields and _number(fields[field])]
+    return found
+
+def model_parameters(code: str):
+    """{name: Parameter} of the sweepable literals of a model, e.g. 'buffer1.capacity' or 'M2.mttr'."""
+    tree = ast.parse(code)
+    found = []
+    for node in tree.body:
+        # run settings such as SIM_TIME and REPLICATIONS, e.g. for a shorter screening horizon
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in RUN_SETTINGS and _arithmetic(node.value):
+                found.append((name, node.value))
+            elif name == "SPEC" and isinstance(node.value, ast.Dict):
+                found += _spec_parameters(node.value)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            target = node.targets[0].id if len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) else None
+            found += _call_parameters(node.value, target)
+        elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            found += _call_parameters(node.value, None)
+    parameters = {}
+    for name, node in found:
+        parameters.setdefault(name, Parameter(name, node))   # the first definition wins
+    return parameters
+
+def _literal(parameter, value):
+    if parameter.integer:
+        return str(int(round(value)))
+    value = float(value)
+    return repr(int(value)) if value.is_integer() and isinstance(parameter.value, int) else repr(round(value, 9))
+
+def apply_parameters(code: str, values: dict, parameters=None):
+    """Model source with the given {name: value} substituted; raises KeyError for unknown names."""
+    parameters = parameters or model_parameters(code)
+    data = code.encode("utf-8")
+    # ast columns are UTF-8 byte offsets
+    starts = [0]
+    for line in data.splitlines(keepends=True):
+        starts.append(starts[-1] + len(line))
+    edits = []
+    for name, value in values.items():
+        if name not in parameters:
+            raise KeyError(f"Unknown model parameter {name!r}; known: {sorted(parameters)}")
+        node = parameters[name].node
+        edits.append((starts[node.lineno - 1] + node.col_offset, starts[node.end_lineno - 1] + node.end_col_offset,
+                      _literal(parameters[name], value)))
+    for start, end, text in sorted(edits, reverse=True):
+        data = data[:start] + text.encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+def grid(space: dict):
+    """Every combination of {name: [values]}, as a list of {name: value}."""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def latin_hypercube(bounds: dict, n: int, seed: int = 0, integer=()):
+    """
+    n points of a Latin-hypercube design over {name: (low, high)}.
+
+    Every parameter's range is cut into n strata and each stratum is hit
+    exactly once, in random order; names in integer are rounded.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    names = list(bounds)
+    points = [{} for _ in range(n)]
+    for name in names:
+        low, high = bounds[name]
+        unit = (rng.permutation(n) + rng.random(n)) / n
+        for point, u in zip(points, unit):
+            value = low + u * (high - low)
+            point[name] = int(round(value)) if name in integer else float(value)
+    return points
+
+class Sweep:
+    """
+    Evaluates parameter configurations of one model and streams the KPIs to a CSV table.
+
+    Each configuration is the model source with the values substituted and
+    runs with the same seeds (common random numbers across the sweep if
+    seeds is given). concurrency models run at the same time on the shared
+    warm pool, each with its share of the cores for its replications.
+    """
+    def __init__(self, code: str, out_path=None, seeds=None, target_half_width=None, concurrency: int = 2,
+                 use_cache: bool = False):
+        self.code = code
+        self.parameters = model_parameters(code)
+        self.out_path = Path(out_path) if out_path else None
+        self.seeds = seeds
+        self.target_half_width = target_half_width
+        self.concurrency = concurrency
+        self.use_cache = use_cache
+        self._lock = threading.Lock()
+        self.rows = self._load_rows()
+
+    def _key(self, point):
+        return tuple(sorted((name, _literal(self.parameters[name], value)) for name, value in point.items()))
+
+    def _load_rows(self):
+        # rows of an earlier run of the sweep, keyed by their configuration
+        rows = {}
+        if self.out_path is None or not self.out_path.exists():
+            return rows
+        with open(self.out_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("error"):
+                    continue
+                point = {name: float(row[name]) for name in row if name in self.parameters and row[name] != ""}
+                rows[self._key(point)] = {**row, **point, **{kpi: float(row[kpi]) for kpi in KPIS},
+                                          "runs": int(row["runs"])}
+        return rows
+
+    def evaluate(self, point: dict):
+        """KPIs of one configuration: the point plus runs, throughput, wip, energy_per_part and error."""
+        try:
+            code = apply_parameters(self.code, point, self.parameters)
+            kpis, _ = retrieve_KPIs(code, f"sweep {point}", use_cache=self.use_cache, seeds=self.seeds,
+                                    target_half_width=self.target_half_width)
+            return {**point, "runs": kpis["runs"], **{kpi: kpis["summary"][kpi] for kpi in KPIS}, "error": ""}
+        except KeyError:
+            raise
+        except Exception as e:
+            return {**point, "runs": 0, **dict.fromkeys(KPIS, float("nan")), "error": str(e).strip().splitlines()[-1]}
+
+    def _columns(self, names):
+        # header of the table; parameters it does not have yet are added by rewriting it under a union header
+        columns = sorted(names) + ["runs", *KPIS, "error"]
+        if not self.out_path.exists() or self.out_path.stat().st_size == 0:
+            return columns
+        with open(self.out_path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            header, rows = reader.fieldnames or [], list(reader)
+        if set(names) <= set(header):
+            return header
+        columns = sorted(set(names) | {name for name in header if name in self.parameters}) + ["runs", *KPIS, "error"]
+        tmp_path = self.out_path.with_name(self.out_path.name + ".tmp")
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, self.out_path)
+        return columns
+
+    def _write(self, row, columns):
+        with self._lock:
+            new = not self.out_path.exists() or self.out_path.stat().st_size == 0
+            with open(self.out_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+                if new:
+                    writer.writeheader()
+                writer.writerow(row)
+
+    def run(self, points, progress: bool = True):
+        """Evaluate the configurations (skipping ones already in the table); returns their rows in order."""
+        points = list(points)
+        for point in points:
+            unknown = set(point) - set(self.parameters)
+            if unknown:
+                raise KeyError(f"Unknown model parameters {sorted(unknown)}; known: {sorted(self.parameters)}")
+        columns = self._columns({name for point in points for name in point}) if self.out_path else None
+        todo = [point for point in points if self._key(point) not in self.rows]
+        get_pool(workers=self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self.evaluate, point): point for point in todo}
+            for done, future in enumerate(as_completed(futures), start=1):
+                row = future.result()
+                if not row["error"]:
+                    self.rows[self._key(futures[future])] = row
+                if self.out_path:
+                    self._write(row, columns)
+                if progress:
+                    print(f"[{done}/{len(todo)}] " + ", ".join(f"{k}={row[k]}" for k in futures[future])
+                          + (f" -> error: {row['error']}" if row["error"] else
+                             f" -> throughput {row['throughput']:.2f}, wip {row['wip']:.2f}, "
+                             f"energy/part {row['energy_per_part']:.4f}"))
+        return [self.rows.get(self._key(point)) for point in points]
+
+    def bayesian_optimization(self, bounds: dict, evaluations: int = 40, initial: int | None = None,
+                              objective: str = "throughput", maximize: bool = True, candidates: int = 2000,
+                              seed: int = 0):
+        """
+        Search bounds {name: (low, high)} for the best objective KPI.
+
+        Starts with a Latin-hypercube design, then repeatedly fits a Gaussian
+        process to all evaluated configurations and runs the `concurrency`
+        candidates with the highest expected improvement, until evaluations
+        configurations are done. Returns all rows, best first.
+        """
+        import numpy as np
+        names = list(bounds)
+        integer = [name for name in names if self.parameters[name].integer]
+        low = np.array([bounds[name][0] for name in names], dtype=float)
+        span = np.array([bounds[name][1] - bounds[name][0] for name in names], dtype=float)
+        span[span == 0] = 1.0
+        sign = 1.0 if maximize else -1.0
+        evaluated = [row for row in self.run(latin_hypercube(bounds, initial or max(2 * len(names) + 2, self.concurrency),
+                                                             seed, integer)) if row]
+        if not evaluated:
+            raise RuntimeError("None of the initial configurations could be simulated; see the error column")
+        round_seed = seed
+        while len(evaluated) < evaluations:
+            X = np.array([[row[name] for name in names] for row in evaluated], dtype=float)
+            y = sign * np.array([row[objective] for row in evaluated])
+            gp = GaussianProcess().fit((X - low) / span, y)
+            round_seed += 1
+            pool = latin_hypercube(bounds, candidates, round_seed, integer)
+            seen = {self._key({name: row[name] for name in names}) for row in evaluated}
+            pool = [point for point in pool if self._key(point) not in seen]
+            if not pool:
+                break
+            C = np.array([[point[name] for name in names] for point in pool], dtype=float)
+            mean, std = gp.predict((C - low) / span)
+            ei = expected_improvement(mean, std, y.max())
+            batch, keys = [], set()
+            for i in np.argsort(-ei):
+                key = self._key(pool[i])
+                if key not in keys:
+                    keys.add(key)
+                    batch.append(pool[i])
+                if len(batch) == min(self.concurrency, evaluations - len(evaluated)):
+                    break
+            evaluated += [row for row in self.run(batch) if row]
+        return sorted(evaluated, key=lambda row: sign * row[objective], reverse=True)
+
+def _range(text, integer):
+    # "1:10" (integers: every value, else 10 steps), "1:10:2" or "1,2,5"
+    if ":" not in text:
+        return [float(v) for v in text.split(",")]
+    parts = [float(v) for v in text.split(":")]
+    low, high = parts[0], parts[1]
+    if len(parts) == 3:
+        return [low + i * parts[2] for i in range(int(math.floor((high - low) / parts[2] + 1e-9)) + 1)]
+    if integer:
+        return list(range(int(low), int(high) + 1))
+    return [low + i * (high - low) / 9 for i in range(10)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1],
+                                     epilog=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", type=Path)
+    parser.add_argument("--list", action="store_true", help="list the sweepable parameters and exit")
+    parser.add_argument("--grid", nargs="+", default=[], metavar="NAME=RANGE", help="full factorial, e.g. buffer1.capacity=1:10")
+    parser.add_argument("--bounds", nargs="+", default=[], metavar="NAME=LOW:HIGH", help="ranges for --lhs and --bo")
+    parser.add_argument("--lhs", type=int, help="Latin-hypercube design with this many points")
+    parser.add_argument("--bo", type=int, help="Bayesian optimization with this many evaluations")
+    parser.add_argument("--objective", default="throughput", choices=KPIS)
+    parser.add_argument("--minimize", action="store_true")
+    parser.add_argument("--set", nargs="+", default=[], metavar="NAME=VALUE", help="fixed values for every point, e.g. SIM_TIME=604800")
+    parser.add_argument("--seeds", type=int, nargs="+")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=Path("results/sweep.csv"))
+    args = parser.parse_args()
+
+    code = args.model.read_text(encoding="utf-8")
+    fixed = {name: float(value) for name, value in (item.split("=", 1) for item in args.set)}
+    if fixed:
+        code = apply_parameters(code, fixed)
+    sweep = Sweep(code, args.out, seeds=args.seeds, concurrency=args.concurrency)
+    if args.list or not (args.grid or args.lhs or args.bo):
+        for parameter in sweep.parameters.values():
+            print(f"{parameter.name:<32} {parameter.value}")
+        return
+    unknown = {item.split("=", 1)[0] for item in args.grid + args.bounds} - set(sweep.parameters)
+    if unknown:
+        parser.error(f"unknown parameters {sorted(unknown)}; see --list")
+    if args.grid:
+        space = {name: _range(text, sweep.parameters[name].integer)
+                 for name, text in (item.split("=", 1) for item in args.grid)}
+        sweep.run(grid(space))
+    bounds = {name: tuple(float(v) for v in text.split(":")[:2]) for name, text in (item.split("=", 1) for item in args.bounds)}
+    integer = [name for name in bounds if sweep.parameters[name].integer]
+    if args.lhs:
+        sweep.run(latin_hypercube(bounds, args.lhs, args.seed, integer))
+    if args.bo:
+        best = sweep.bayesian_optimization(bounds, args.bo, objective=args.objective, maximize=not args.minimize,
+                                           seed=args.seed)
+        print(f"Best {args.objective}: " + ", ".join(f"{name}={best[0][name]}" for name in bounds)
+              + f" -> {best[0][args.objective]:.4f}")
+    print(f"Results in {args.out}")
+
+if __name__ == "__main__":
+    main()
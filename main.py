@@ -1,125 +1,191 @@
-import os
-from matplotlib import pyplot as plt
-from openai import OpenAI
-from processmining import eventlog, metrics
-from agents.builder import ModelBuilder
-from agents.optimizer import Modeloptimizer
-from agents.adapter import Modeladaptor
-from agents.evaluator import Evaluater
-from agents.cpdagent import CPD
-from agents.visualizer import Modelvisualizer
-from helpers.other_helpers import save_model, remove_code_wrappers, retrieve_KPIs, visualize_results
-from helpers.mermaid_renderer import render_mermaid_to_png
-import pandas as pd
+import os
 import time
 from pathlib import Path
 
+llm_cache_mode = os.getenv("LLM_CACHE_MODE", "readwrite")  # readwrite, replay (offline) or off
 api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
+if not api_key and llm_cache_mode != "replay":
     raise RuntimeError(
         "OPENAI_API_KEY is not set. Export it in your shell before running main.py."
     )
-client = OpenAI(api_key=api_key)
+
+# heavy imports only after the API key check, so a missing key fails fast
+from processmining import eventlog, metrics
+from processmining.incremental import IncrementalMetrics
+from agents.builder import ModelBuilder
+from agents.optimizer import Modeloptimizer
+from agents.adapter import Modeladaptor
+from agents.evaluator import Evaluater
+from agents.cpdagent import CPD
+from agents.visualizer import Modelvisualizer
+from helpers.other_helpers import save_model, remove_code_wrappers, retrieve_KPIs, format_kpis, visualize_results, pyplot
+from helpers.mermaid_renderer import render_mermaid_to_png
+from helpers.runner import get_pool
+from helpers.llm_cache import CachedClient
+from helpers.comparison import common_seeds, paired_comparison, format_comparison
+from helpers.surrogate import Surrogate, format_screening
+from helpers.sweep import model_parameters
+
+if api_key:
+    from openai import OpenAI   # not needed when replaying cached responses
+client = CachedClient(OpenAI(api_key=api_key) if api_key else None, cache_dir=".llm_cache", mode=llm_cache_mode)
 file_path_eventlog = Path("data/workingtest.csv")
-#file_path_machine = Path("data/workingtest.csv")
-#file_path_blueprintmodel_active = Path("blueprints/blueprint active.py")
-file_path_blueprintmodel_util = Path("blueprint/blueprint_util.py")
-final_path = Path("results")
-buffers_info_specific = "PostLoadingBuffer(Capacity = 2, processtime = 10), PostConveyorBuffer(Capacity = 2, processtime = 10), PostWashingBuffer(Capacity = 2, processtime = 10), PrePress1Buffer(Capacity = 3, processtime = 32), PrePress2Buffer(Capacity = 3, processtime = 32), " \
-"PostPress1&Press2Buffer(Capacity = 3, processtime = 32)"
-defect_info = "Defect rate = 0.089, defect sink = defect,initiated at Qualitystation"
-cpd_info ="1. The presses need to have a processtime of at least 60s. 2. All buffer capacities musst be kept at the same original level. "
-
-def main() -> None:
-    df_raw = eventlog.load(file_path_eventlog)
-    df_clean = eventlog.preprocess(df_raw)
-    stations_md = metrics.compute(df_clean).to_string(index=False)
-    sequence_text = eventlog.to_sequence_text(df_clean)
-    print(stations_md)
-    print("")
-    print(sequence_text)
-
-    # read-in the blueprint
-    blueprint_code = open(file_path_blueprintmodel_util, "r", encoding="utf-8").read()
-
-    # Build initial model
-    builder = ModelBuilder(client)
-    model_code = builder.build(
-        blueprint_code=blueprint_code,
-        stations_table_md=stations_md,
-        sequence_text=sequence_text,
-        buffers=buffers_info_specific,  
-        defects=defect_info,  
-        manual_note="Production stops from friday 17.00 till saturday 07:00 and from saturday 17:00 till sunday 07:00.")
-
-    clean_initial_model = remove_code_wrappers(model_code)
-    save_model(clean_initial_model,final_path, "initial_model.py")
-    init_model_path = os.path.join(final_path,"initial_model.py" )
-
-    # Manual adaptation
-    manual = input("Do you want to manually edit the initial model before proceeding? (y/n): ").strip().lower()
-    if manual == 'y':
-        print(f" Please open and edit:\n  {init_model_path}\n When you're done, save it and press Enter.")
-        input()  # wait for user confirmation
-        # reload their edits
-        with open(init_model_path, 'r', encoding='utf-8') as f:
-            clean_initial_model = f.read()
-        print("Loaded your manually adapted model.")
-
-    # Visualize initial model into flow chart
-    visualizer = Modelvisualizer(client)
-    mermaid_code = visualizer.visualize_agent(clean_initial_model)
-    mmd_path = final_path + "/model_visualization.mmd"
-    png_path = final_path + "/model_visualization.png"
-    with open(mmd_path, "w", encoding="utf-8") as f:
-        f.write(mermaid_code)
-    render_mermaid_to_png(mmd_path, png_path)
-    print(f"Flow chart saved to: {png_path}")
-
-    kpi_original, bottleneck_original = retrieve_KPIs(clean_initial_model, "Original model")
-    results = []
-    results.append(kpi_original)
-    print(kpi_original)
-    print(bottleneck_original)
-
-    optimizer = Modeloptimizer(client)
-    suggestions = optimizer.optimize(
-        model_code = clean_initial_model,
-        bottlenecks= bottleneck_original
-    )
-
-    print(suggestions)
-
-    if isinstance(suggestions, dict):
-        step_list = suggestions.get("instructions", [])
-    elif isinstance(suggestions, list):
-        step_list = suggestions
-    else:
-        raise ValueError("Unexpected format from agent_bottleneck")
-    
-    human_input = input("Do you want to manually add one change to the model? If yes please answer with the change (leave blank to skip): ").strip().lower()
-    if human_input:
-        print("Added human input.")
-        step_list.append(human_input)
-    
-    cpdexpert = CPD(client)
-    print(cpdexpert.evaluatecpd(step_list, cpd_info))
-    
-    for idx, step in enumerate(step_list, start=1):
-        adaptor = Modeladaptor(client)
-        kpi_adapted_model, bottleneck_adapted_model = adaptor.adapter(original_code = clean_initial_model, instruction=step, final_path=final_path, multi_agent_setting= False, index_model= idx)
-        print(kpi_adapted_model) # Append each adapted model's KPIs to results
-        results.append(kpi_adapted_model)
-
-    # Evaluate all results
-    evaluator = Evaluater(client)
-    print(evaluator.evaluate(results))
-
-    visualize_results(results, save_path=final_path)
-    plt.show()
-
-if __name__ == "__main__":
-    start = time.time()
-    main()
-    end = time.time()
+#file_path_machine = Path("data/workingtest.csv")
+#file_path_blueprintmodel_active = Path("blueprints/blueprint active.py")
+file_path_blueprintmodel_util = Path("blueprint/blueprint_util.py")
+final_path = Path("results")
+buffers_info_specific = "PostLoadingBuffer(Capacity = 2, processtime = 10), PostConveyorBuffer(Capacity = 2, processtime = 10), PostWashingBuffer(Capacity = 2, processtime = 10), PrePress1Buffer(Capacity = 3, processtime = 32), PrePress2Buffer(Capacity = 3, processtime = 32), " \
+"PostPress1&Press2Buffer(Capacity = 3, processtime = 32)"
+defect_info = "Defect rate = 0.089, defect sink = defect,initiated at Qualitystation"
+stop_windows = ["Fri 17:00-Sat 07:00", "Sat 17:00-Sun 07:00"]   # weekly production stops
+cpd_info ="1. The presses need to have a processtime of at least 60s. 2. All buffer capacities musst be kept at the same original level. "
+llm_concurrency = 4   # adaptation requests in flight at the same time
+sim_concurrency = 2   # adapted models simulated at the same time
+# the original model's replications stop once throughput and energy per part reach this
+# relative 95% CI half-width (at most len(comparison_seeds) runs); with comparison_seeds the
+# adapted models then run exactly the seeds the original stopped at; None runs every seed
+target_half_width = None
+# every model runs these replication seeds, so adapted models are compared pairwise
+# with the original under common random numbers; None keeps each model's own seeds.
+# The model's own 10 (the replications the builder asks for), widened to 30 for the adaptive stop
+comparison_seeds = [11 + i for i in range(30 if target_half_width else 10)]
+incremental_metrics = True   # keep the event log's aggregates between runs, only read appended rows
+topology_spec = False   # let the builder emit a declarative line spec that is compiled, instead of model code
+# sweep table of the initial model (python -m helpers.sweep results/initial_model.py ...); when set, a surrogate
+# fitted to it screens the optimizer's suggestions and only promising or uncertain ones are simulated
+surrogate_table = None   # e.g. Path("results/sweep.csv")
+
+def main() -> None:
+    get_pool(workers=sim_concurrency)
+    if incremental_metrics:
+        log_state = IncrementalMetrics(file_path_eventlog)
+        log_state.update()
+        stations_md = log_state.stations_table().to_string(index=False)
+        sequence_text = log_state.sequence_text()
+    else:
+        df_clean = eventlog.load_preprocessed(file_path_eventlog)
+        stations_md = metrics.compute(df_clean).to_string(index=False)
+        sequence_text = eventlog.to_sequence_text(df_clean)
+    print(stations_md)
+    print("")
+    print(sequence_text)
+
+    # read-in the blueprint
+    blueprint_code = open(file_path_blueprintmodel_util, "r", encoding="utf-8").read()
+
+    # Build initial model
+    builder = ModelBuilder(client)
+    if topology_spec:
+        model_code = builder.build_spec(
+            stations_table_md=stations_md,
+            sequence_text=sequence_text,
+            buffers=buffers_info_specific,
+            defects=defect_info,
+            stop_windows=stop_windows)
+    else:
+        model_code = builder.build(
+            blueprint_code=blueprint_code,
+            stations_table_md=stations_md,
+            sequence_text=sequence_text,
+            buffers=buffers_info_specific,  
+            defects=defect_info,  
+            stop_windows=stop_windows)
+
+    clean_initial_model = remove_code_wrappers(model_code)
+    save_model(clean_initial_model,final_path, "initial_model.py")
+    init_model_path = os.path.join(final_path,"initial_model.py" )
+
+    # Manual adaptation
+    manual = input("Do you want to manually edit the initial model before proceeding? (y/n): ").strip().lower()
+    if manual == 'y':
+        print(f" Please open and edit:\n  {init_model_path}\n When you're done, save it and press Enter.")
+        input()  # wait for user confirmation
+        # reload their edits
+        with open(init_model_path, 'r', encoding='utf-8') as f:
+            clean_initial_model = f.read()
+        print("Loaded your manually adapted model.")
+
+    # Visualize initial model into flow chart
+    visualizer = Modelvisualizer(client)
+    mermaid_code = visualizer.visualize_agent(clean_initial_model)
+    mmd_path = final_path + "/model_visualization.mmd"
+    png_path = final_path + "/model_visualization.png"
+    with open(mmd_path, "w", encoding="utf-8") as f:
+        f.write(mermaid_code)
+    render_mermaid_to_png(mmd_path, png_path)
+    print(f"Flow chart saved to: {png_path}")
+
+    kpi_original, bottleneck_original = retrieve_KPIs(clean_initial_model, "Original model", seeds=comparison_seeds,
+                                                      target_half_width=target_half_width)
+    results = []
+    results.append(kpi_original)
+    print("\n".join(format_kpis(kpi_original)))
+    print("\n".join(bottleneck_original))
+
+    surrogate = Surrogate.from_table(surrogate_table, clean_initial_model) if surrogate_table else None
+    optimizer = Modeloptimizer(client)
+    suggestions = optimizer.optimize(
+        model_code = clean_initial_model,
+        bottlenecks= bottleneck_original,
+        parameters= [f"{p.name} = {p.value}" for p in model_parameters(clean_initial_model).values()] if surrogate else None
+    )
+
+    print(suggestions)
+
+    if isinstance(suggestions, dict):
+        step_list = suggestions.get("instructions", [])
+    elif isinstance(suggestions, list):
+        step_list = suggestions
+    else:
+        raise ValueError("Unexpected format from agent_bottleneck")
+
+    if surrogate:
+        changes = suggestions.get("changes", []) if isinstance(suggestions, dict) else []
+        changes = (changes + [{}] * len(step_list))[:len(step_list)]
+        decisions = surrogate.screen(changes)
+        print("\n".join(format_screening(step_list, decisions)))
+        step_list = [step for step, decision in zip(step_list, decisions) if decision["simulate"]]
+    
+    human_input = input("Do you want to manually add one change to the model? If yes please answer with the change (leave blank to skip): ").strip().lower()
+    if human_input:
+        print("Added human input.")
+        step_list.append(human_input)
+    
+    cpdexpert = CPD(client)
+    print(cpdexpert.evaluatecpd(step_list, cpd_info))
+    
+    # paired comparisons need every adapted model on the same seeds as the original, not its own stopping point
+    if comparison_seeds:
+        candidate_seeds, candidate_half_width = kpi_original["seeds"] or comparison_seeds, None
+    else:
+        candidate_seeds, candidate_half_width = None, target_half_width
+    adaptor = Modeladaptor(client)
+    adapted = adaptor.adapt_many(original_code = clean_initial_model, instructions=step_list, final_path=final_path, multi_agent_setting= False,
+                                 llm_concurrency=llm_concurrency, sim_concurrency=sim_concurrency, seeds=candidate_seeds,
+                                 target_half_width=candidate_half_width)
+    for index_model, adapted_result in enumerate(adapted, start=1):
+        if isinstance(adapted_result, Exception):
+            print(f"Adapted model version {index_model} failed and is left out: {adapted_result}")
+            continue
+        kpi_adapted_model, bottleneck_adapted_model = adapted_result
+        print("\n".join(format_kpis(kpi_adapted_model))) # Append each adapted model's KPIs to results
+        if comparison_seeds and len(common_seeds(kpi_original, kpi_adapted_model)) < 2:
+            print(f"Warning: no paired comparison for {kpi_adapted_model['model']}, "
+                  "the original or adapted model reported no per-replication results")
+        elif comparison_seeds:
+            comparison = paired_comparison(kpi_original, kpi_adapted_model)
+            print("\n".join(format_comparison(comparison, kpi_adapted_model["model"], kpi_original["model"])))
+        results.append(kpi_adapted_model)
+
+    # Evaluate all results
+    evaluator = Evaluater(client)
+    print(evaluator.evaluate(results))
+
+    visualize_results(results, save_path=final_path, paired=bool(comparison_seeds))
+    pyplot().show()
+
+if __name__ == "__main__":
+    start = time.time()
+    main()
+    end = time.time()
     print(f"\nTotal execution time: {end - start:.2f} seconds")
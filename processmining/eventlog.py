@@ -1,32 +1,180 @@
-from pathlib import Path
-import pandas as pd
-import pm4py
-
-def load(path: Path):
-    return pd.read_csv(path)
-
-def preprocess(df: pd.DataFrame):
-    for col in ("StartTime", "EndTime"):
-        df[col] = pd.to_datetime(df[col])
-    df = df.sort_values("EndTime")
-    # Fix identical timestamps
-    df["EndTime"] += pd.to_timedelta(
-        df.groupby(["ID", "EndTime"]).cumcount(), unit="s")
-    return df
-
-def to_sequence_text(df: pd.DataFrame):
-    #Return the follows / parallel text block.
-    event_log = pm4py.format_dataframe(
-        df, case_id="ID", activity_key="MachineName", timestamp_key="EndTime")
-    from pm4py.algo.discovery.footprints import algorithm as fp
-    fp_net = fp.apply(event_log)
-
-    lines = ["Directly-follows relationships:"]
-    lines += [f"{a} -> {b}" for a, b in fp_net["sequence"]]
-
-    # drop pairs where the two activities are identical
-    cleaned_parallel = [(a, b) for a, b in fp_net["parallel"] if a != b]
-
-    lines += ["", "Parallel relationships:"]
-    lines += [f"{a} || {b}" for a, b in cleaned_parallel]
+import glob
+import hashlib
+import os
+from pathlib import Path
+import pandas as pd
+from processmining import footprints
+
+TIMESTAMP_FORMAT = "%m/%d/%Y %H:%M:%S"
+DATE_COLUMNS = ("StartTime", "EndTime")
+# declared dtypes of the input data contract; dates are parsed separately
+DTYPES = {"ID": "str", "MachineName": "category", "ReasonCode": "category", "EnergyConsumption": "float64"}
+# columns each stage reads, for column projection; the sequence stage only needs a subset of the metrics one
+METRICS_COLUMNS = ["ID", "MachineName", "StartTime", "EndTime", "ReasonCode", "EnergyConsumption"]
+SEQUENCE_COLUMNS = ["ID", "MachineName", "EndTime"]
+# bump when preprocess changes, so stale caches are not read
+CACHE_VERSION = 2
+
+def load(path: Path, columns: list[str] | None = METRICS_COLUMNS):
+    """The columns of the event log (None: all) with the declared dtypes; dates are left to preprocess."""
+    dtypes = {col: dtype for col, dtype in DTYPES.items() if columns is None or col in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtypes)
+
+def _parse_dates(df: pd.DataFrame, timestamp_format: str | None):
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        try:
+            df[col] = pd.to_datetime(df[col], format=timestamp_format)
+        except (ValueError, TypeError):
+            # timestamps not in the declared format: fall back to inference
+            df[col] = pd.to_datetime(df[col])
+    return df
+
+def preprocess(df: pd.DataFrame):
+    df = _parse_dates(df, TIMESTAMP_FORMAT)
+    df = df.sort_values("EndTime", kind="stable")
+    # Fix identical timestamps
+    df["EndTime"] += pd.to_timedelta(
+        df.groupby(["ID", "EndTime"]).cumcount(), unit="s")
+    return df
+
+def iter_chunks(path: Path, chunksize: int = 1_000_000, columns: list[str] | None = None,
+                timestamp_format: str | None = TIMESTAMP_FORMAT, tie_window=pd.Timedelta(days=1)):
+    """
+    Read and preprocess the event log in chunks of at most chunksize rows.
+
+    Columns are read with the declared dtypes (MachineName and ReasonCode as
+    categoricals) and timestamps with timestamp_format, so memory stays
+    bounded by the chunk size. columns restricts reading to the columns a
+    stage needs. Each chunk is sorted by EndTime; identical (ID, EndTime)
+    timestamps are de-duplicated as in preprocess, also across chunk borders
+    as long as the duplicates lie within tie_window of the newest EndTime.
+    """
+    dtypes = {col: dtype for col, dtype in DTYPES.items() if columns is None or col in columns}
+    seen = None
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        chunk = _parse_dates(chunk, timestamp_format)
+        if "ID" in chunk.columns and "EndTime" in chunk.columns:
+            chunk, seen = separate_ties(chunk, seen, tie_window)
+        yield chunk
+
+def separate_ties(chunk: pd.DataFrame, seen: pd.Series | None = None, tie_window=pd.Timedelta(days=1)):
+    """
+    Sort a chunk by EndTime and shift identical (ID, EndTime) timestamps apart.
+
+    seen holds the occurrences of recent (ID, EndTime) keys in earlier
+    chunks (None for the first one); the updated counts, pruned to keys
+    within tie_window of the newest EndTime, are returned with the chunk.
+    """
+    if seen is None:
+        seen = pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays([[], []], names=["ID", "EndTime"]))
+    chunk = chunk.sort_values("EndTime", kind="stable")
+    keys = pd.MultiIndex.from_frame(chunk[["ID", "EndTime"]])
+    rank = chunk.groupby(["ID", "EndTime"]).cumcount().to_numpy(copy=True)
+    rank += seen.reindex(keys, fill_value=0).to_numpy()
+    seen = pd.concat([seen, pd.Series(rank + 1, index=keys)]).groupby(level=[0, 1]).max()
+    seen = seen[seen.index.get_level_values(1) >= chunk["EndTime"].max() - tie_window]
+    chunk["EndTime"] += pd.to_timedelta(rank, unit="s")
+    return chunk, seen
+
+def _content_digest(path: Path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def _cache_path(path: Path, columns: list[str] | None = None):
+    """
+    The cache file of the source and columns, and the other caches of the same columns.
+
+    Caches are named .<name>.<columns key>.<size>-<mtime>.<content digest>.arrow
+    next to the source. The source is only hashed when its size or mtime
+    differ from every cache's; a cache whose content digest still matches
+    (e.g. the file was touched or copied) is renamed to the new stamp.
+    """
+    column_key = hashlib.sha256(f"v{CACHE_VERSION}:{columns}".encode()).hexdigest()[:8]
+    prefix = f".{path.name}.{column_key}."
+    stat = path.stat()
+    stamp = f"{stat.st_size}-{stat.st_mtime_ns}"
+    caches = list(path.parent.glob(f"{glob.escape(prefix)}*.arrow"))
+    cache = next((c for c in caches if c.name.startswith(f"{prefix}{stamp}.")), None)
+    if cache is None:
+        digest = _content_digest(path)
+        cache = path.with_name(f"{prefix}{stamp}.{digest}.arrow")
+        same = next((c for c in caches if c.name.endswith(f".{digest}.arrow")), None)
+        if same is not None:
+            try:
+                os.replace(same, cache)
+            except OSError:
+                cache = same
+    return cache, [c for c in caches if c.name != cache.name]
+
+def load_preprocessed(path: Path, use_cache: bool = True, columns: list[str] | None = METRICS_COLUMNS):
+    """
+    load + preprocess, cached as an Arrow IPC file next to the source.
+
+    Only columns are read (by default those the stations table and the
+    sequence text need; None reads all). The cache is keyed by the source
+    file's size, mtime and hash and the columns and read memory-mapped, so
+    later runs skip CSV and datetime parsing. Without pyarrow (or with
+    use_cache=False) the CSV is parsed every time.
+    """
+    path = Path(path)
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        use_cache = False
+    if not use_cache:
+        return preprocess(load(path, columns))
+
+    cache, others = _cache_path(path, columns)
+    if cache.exists():
+        try:
+            return feather.read_feather(cache, memory_map=True)
+        except Exception:
+            cache.unlink(missing_ok=True)   # unreadable, rebuild below
+
+    df = preprocess(load(path, columns))
+    # stale caches of these columns only; other projections keep theirs
+    for stale in others:
+        stale.unlink(missing_ok=True)
+    # uncompressed, so later reads can map it instead of decoding
+    tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+    try:
+        feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+        os.replace(tmp, cache)
+    except OSError:
+        tmp.unlink(missing_ok=True)   # read-only data directory: just skip caching
+    return df
+
+def to_sequence_text(df: pd.DataFrame, counts: bool = False, cross_check: bool = False):
+    """
+    Directly-follows and parallel relations as text, sorted by pair.
+
+    counts appends each pair's directly-follows frequency. cross_check
+    compares the relations with pm4py's footprints and raises ValueError on
+    a mismatch.
+    """
+    dfg = footprints.directly_follows(df)
+    if cross_check and tuple(map(set, footprints.footprints(dfg))) != footprints.pm4py_footprints(df):
+        raise ValueError("Directly-follows relations differ from pm4py's footprints")
+    return relations_text(dfg, counts)
+
+def relations_text(dfg: dict, counts: bool = False):
+    """to_sequence_text of a directly-follows graph {(a, b): frequency}."""
+    sequence, parallel = footprints.footprints(dfg)
+
+    def line(a, sep, b, n):
+        return f"{a} {sep} {b} ({n})" if counts else f"{a} {sep} {b}"
+
+    lines = ["Directly-follows relationships:"]
+    lines += [line(a, "->", b, n) for (a, b), n in sorted(sequence.items())]
+
+    # drop pairs where the two activities are identical
+    cleaned_parallel = {(a, b): n for (a, b), n in parallel.items() if a != b}
+
+    lines += ["", "Parallel relationships:"]
+    lines += [line(a, "||", b, n) for (a, b), n in sorted(cleaned_parallel.items())]
     return "\n".join(lines)
\ No newline at end of file
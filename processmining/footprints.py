@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+def directly_follows(df: pd.DataFrame, case_id="ID", activity_key="MachineName", timestamp_key="EndTime"):
+    """
+    Directly-follows graph of an event log as {(a, b): frequency}.
+
+    Events are ordered by case and timestamp (ties keep their row order, as
+    in pm4py) and each event is paired with the next one of the same case.
+    """
+    cases = df[case_id].to_numpy()
+    order = np.lexsort((np.arange(len(df)), df[timestamp_key].to_numpy(), cases))
+    cases = cases[order]
+    activities = df[activity_key].to_numpy()[order]
+    same_case = cases[1:] == cases[:-1]
+    pairs = pd.DataFrame({"a": activities[:-1][same_case], "b": activities[1:][same_case]})
+    counts = pairs.groupby(["a", "b"], sort=True).size()
+    return {(a, b): int(n) for (a, b), n in counts.items()}
+
+def footprints(dfg: dict):
+    """
+    Sequence and parallel relations of a directly-follows graph.
+
+    a -> b is a sequence if b never directly follows a, a || b is parallel
+    if both directions occur, matching pm4py's footprints discovery.
+    """
+    sequence = {pair: n for pair, n in dfg.items() if n > 0 and dfg.get(pair[::-1], 0) == 0}
+    parallel = {pair: n for pair, n in dfg.items() if pair[::-1] in dfg}
+    return sequence, parallel
+
+def pm4py_footprints(df: pd.DataFrame, case_id="ID", activity_key="MachineName", timestamp_key="EndTime"):
+    """Sequence and parallel pairs from pm4py's footprints discovery, as a cross-check."""
+    import pm4py   # slow to import, so only when asked for
+    from pm4py.algo.discovery.footprints import algorithm as fp
+    event_log = pm4py.format_dataframe(
+        df, case_id=case_id, activity_key=activity_key, timestamp_key=timestamp_key)
+    fp_net = fp.apply(event_log)
+    return set(fp_net["sequence"]), set(fp_net["parallel"])
@@ -0,0 +1,155 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+import pandas as pd
+from processmining import eventlog, footprints, metrics
+
+STATE_VERSION = 2
+_TAIL_BYTES = 1 << 16   # bytes before the read offset that must stay unchanged
+_AGGREGATE_COLUMNS = ["MachineName", "ReasonCode", "Events", "TimedEvents", "EnergyConsumption", "ProcessTime_s"]
+
+class IncrementalMetrics:
+    """
+    Stations table and directly-follows relations of an event log that only grows.
+
+    The aggregate state (per machine and ReasonCode: process seconds, event
+    counts and energy; the number of produced parts; directly-follows
+    counts; the events within tie_window of the newest one) is persisted as
+    JSON next to the log together with the byte offset read so far, so its
+    size does not grow with the history. update() parses only the rows
+    appended since, so a refresh costs time proportional to the new data.
+    Appended rows may be out of order by up to tie_window. A part with no
+    event within tie_window of the newest one is forgotten: if it shows up
+    again, it is counted as a new part and its next event starts a new
+    directly-follows chain. If the file shrank or the bytes just before the
+    read offset changed (the log was replaced rather than appended to), the
+    state is rebuilt from the first row.
+    """
+    def __init__(self, path: Path, state_path: Path | None = None, chunksize: int = 1_000_000,
+                 timestamp_format: str | None = eventlog.TIMESTAMP_FORMAT, tie_window=pd.Timedelta(days=1)):
+        self.path = Path(path)
+        self.state_path = Path(state_path) if state_path else self.path.with_name(f".{self.path.name}.metrics.json")
+        self.chunksize = chunksize
+        self.timestamp_format = timestamp_format
+        self.tie_window = tie_window
+        self.state = self._load_state()
+
+    def _empty_state(self):
+        with open(self.path, "rb") as f:
+            header = f.readline()
+        return {"version": STATE_VERSION, "header": list(pd.read_csv(self.path, nrows=0).columns),
+                "offset": len(header), "tail": _digest(header[-_TAIL_BYTES:]), "aggregate": [], "parts": 0,
+                "dfg": [], "recent_events": [], "ties": []}
+
+    def _load_state(self):
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            if state.get("version") == STATE_VERSION:
+                return state
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        return self._empty_state()
+
+    def _unchanged(self, f):
+        # the file may only have grown since the last update
+        offset = self.state["offset"]
+        if f.seek(0, os.SEEK_END) < offset:
+            return False
+        start = max(0, offset - _TAIL_BYTES)
+        f.seek(start)
+        return _digest(f.read(offset - start)) == self.state["tail"]
+
+    def update(self) -> int:
+        """Fold the rows appended since the last update into the state; returns their number."""
+        with open(self.path, "rb") as f:
+            if not self._unchanged(f):
+                self.state = self._empty_state()
+            offset = self.state["offset"]
+            f.seek(offset)
+            data = f.read()
+        # only complete lines; a row still being written is read next time
+        data = data[:data.rfind(b"\n") + 1]
+        if not data.strip():
+            return 0
+
+        agg = pd.DataFrame.from_records(self.state["aggregate"], columns=_AGGREGATE_COLUMNS)
+        parts = self.state["parts"]
+        dfg = Counter({(a, b): n for a, b, n in self.state["dfg"]})
+        recent = self._recent_events()
+        seen = self._ties()
+        rows = 0
+        # only the columns the stations table and the directly-follows relations need
+        columns = [col for col in eventlog.METRICS_COLUMNS if col in self.state["header"]]
+        dtypes = {col: dtype for col, dtype in eventlog.DTYPES.items() if col in columns}
+        for chunk in pd.read_csv(io.BytesIO(data), names=self.state["header"], header=None, usecols=columns,
+                                 dtype=dtypes, chunksize=self.chunksize):
+            chunk = eventlog._parse_dates(chunk, self.timestamp_format)
+            chunk, seen = eventlog.separate_ties(chunk, seen, self.tie_window)
+            agg = metrics.combine([agg, metrics.aggregate(chunk)]) if len(agg) else metrics.aggregate(chunk)
+            ids = chunk["ID"].unique()
+            # parts with recent events are known; the others are new
+            parts += len(set(ids) - set(recent["ID"]))
+            # re-count the directly-follows pairs of the parts' recent events with the new ones merged in
+            touched = recent["ID"].isin(ids)
+            events = pd.concat([recent[touched],
+                                chunk[eventlog.SEQUENCE_COLUMNS].astype({"MachineName": object})],
+                               ignore_index=True)
+            dfg.subtract(footprints.directly_follows(recent[touched]))
+            dfg.update(footprints.directly_follows(events))
+            recent = self._prune(pd.concat([recent[~touched], events], ignore_index=True))
+            rows += len(chunk)
+
+        tail_start = max(0, offset + len(data) - _TAIL_BYTES)
+        with open(self.path, "rb") as f:
+            f.seek(tail_start)
+            tail = f.read(offset + len(data) - tail_start)
+        self.state.update(
+            offset=offset + len(data), tail=_digest(tail),
+            aggregate=agg.to_dict("records"), parts=parts,
+            dfg=[[a, b, n] for (a, b), n in sorted(dfg.items()) if n > 0],
+            recent_events=[[case, activity, end.isoformat()] for case, activity, end in recent.itertuples(index=False)],
+            ties=[[case, end.isoformat(), int(n)] for (case, end), n in seen.items()])
+        self.save()
+        return rows
+
+    def _recent_events(self):
+        ids, activities, ends = zip(*self.state["recent_events"]) if self.state["recent_events"] else ((), (), ())
+        return pd.DataFrame({"ID": pd.Series(ids, dtype="str"), "MachineName": pd.Series(activities, dtype=object),
+                             "EndTime": pd.to_datetime(list(ends)).as_unit("us")})
+
+    def _prune(self, events):
+        # keep events within tie_window of the newest one
+        keep = events["EndTime"] >= events["EndTime"].max() - self.tie_window
+        return events[keep].reset_index(drop=True)
+
+    def _ties(self):
+        if not self.state["ties"]:
+            return None
+        ids, ends, counts = zip(*self.state["ties"])
+        index = pd.MultiIndex.from_arrays([list(ids), pd.to_datetime(list(ends)).as_unit("us")], names=["ID", "EndTime"])
+        return pd.Series(counts, index=index, dtype="int64")
+
+    def save(self):
+        # write to a scratch file first so an interrupted save keeps the old state
+        fd, tmp_name = tempfile.mkstemp(dir=self.state_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_name, self.state_path)
+
+    def stations_table(self):
+        """Same table as metrics.compute over the whole log."""
+        if not self.state["aggregate"]:
+            raise ValueError("Event log contains no rows")
+        agg = pd.DataFrame.from_records(self.state["aggregate"], columns=_AGGREGATE_COLUMNS)
+        return metrics.stations_table(agg, self.state["parts"])
+
+    def sequence_text(self, counts: bool = False):
+        """Same text as eventlog.to_sequence_text over the whole log."""
+        return eventlog.relations_text({(a, b): n for a, b, n in self.state["dfg"]}, counts)
+
+def _digest(data: bytes):
+    return hashlib.sha256(data).hexdigest()
@@ -1,45 +1,94 @@
-import pandas as pd
-
-def compute(df: pd.DataFrame):
-    df = df.copy()
-
-    df["ProcessTime"] = df["EndTime"] - df["StartTime"]
-    produced_parts = df["ID"].nunique()
-
-    # Running times & average cycle time
-    running = df[df["ReasonCode"].isin(["Working", "Warning"])]
-    running_sec = running.groupby("MachineName")["ProcessTime"].sum().dt.total_seconds()
-    avg_time_per_part = (running_sec/produced_parts).rename("Avg_Time_per_part_s")
-
-    # Availability
-    grouped = (df.groupby(["MachineName", "ReasonCode"])["ProcessTime"].sum().unstack(fill_value=pd.Timedelta(0)))
-    # convert timedeltas to seconds
-    for col in grouped.columns:
-        grouped[col] = grouped[col].dt.total_seconds()
-
-    available = grouped.get("Working", 0) + grouped.get("Idle", 0) + grouped.get("Warning", 0)
-    grouped["Availability_%"] = available / grouped.sum(axis=1) * 100
-    availability_pct = grouped["Availability_%"]
-
-    # MTTR
-    stopped = df[df["ReasonCode"] == "Stopped"]
-    mttr = (stopped.groupby("MachineName")["ProcessTime"].mean().dt.total_seconds().reindex(grouped.index)).rename("MTTR_s")
-
-    # if a machine never stopped but is 100% available, assign an MTTR of 1 s
-    mttr[mttr.isna() & (availability_pct == 100)] = 1.0
-
-    # Energy rates (kJ per second)
-    keep = df[df["ReasonCode"].isin(["Working", "Idle", "Idle for Deviation", "Warning"])].copy()
-    keep["Category"] = keep["ReasonCode"].map(lambda x: "EnergyWorking" if x in ("Working", "Warning") else "EnergyIdling")
-    energy = (keep.groupby(["MachineName", "Category"]).agg({"EnergyConsumption": "sum", "ProcessTime": "sum"}))
-    energy["s"] = energy["ProcessTime"].dt.total_seconds()
-    energy["kJ_per_s"] = energy["EnergyConsumption"] / energy["s"]
-    energy = energy["kJ_per_s"].unstack(fill_value=0)
-
-    # Merge & round
-    final = (pd.concat([avg_time_per_part, grouped["Availability_%"], mttr, energy], axis=1).reset_index().rename(columns={"index": "MachineName"}))
-
-    # round all numeric columns to two decimal places
-    numeric_cols = final.select_dtypes(include="number").columns
-    final[numeric_cols] = final[numeric_cols].round(2)
-    return final
\ No newline at end of file
+import pandas as pd
+
+RUNNING_CODES = ("Working", "Warning")
+AVAILABLE_CODES = ("Working", "Idle", "Warning")
+# ReasonCodes that enter the energy rates and their category
+ENERGY_CATEGORIES = {"Working": "EnergyWorking", "Warning": "EnergyWorking",
+                     "Idle": "EnergyIdling", "Idle for Deviation": "EnergyIdling"}
+
+def aggregate(df: pd.DataFrame):
+    """
+    Per (MachineName, ReasonCode): summed process seconds, event counts and energy.
+
+    This is the only pass over the event rows; everything in the stations
+    table is derived from it. Partial aggregates of several chunks can be
+    merged with combine().
+    """
+    process_time = df["EndTime"] - df["StartTime"]
+    keys = [df["MachineName"].astype("category").rename("MachineName"),
+            df["ReasonCode"].astype("category").rename("ReasonCode")]
+    agg = (pd.DataFrame({"ProcessTime": process_time, "EnergyConsumption": df["EnergyConsumption"]})
+           .groupby(keys, observed=True)
+           .agg(ProcessTime=("ProcessTime", "sum"),
+                Events=("ProcessTime", "size"),
+                TimedEvents=("ProcessTime", "count"),
+                EnergyConsumption=("EnergyConsumption", "sum")))
+    agg["ProcessTime_s"] = agg.pop("ProcessTime").dt.total_seconds()
+    agg = agg.reset_index()
+    for col in ("MachineName", "ReasonCode"):
+        agg[col] = agg[col].astype(object)
+    return agg
+
+def combine(aggregates):
+    """Merge partial aggregates (e.g. of chunks or appended rows) into one."""
+    merged = pd.concat(list(aggregates), ignore_index=True)
+    return merged.groupby(["MachineName", "ReasonCode"], as_index=False, sort=True).sum()
+
+def stations_table(agg: pd.DataFrame, produced_parts: int):
+    """Stations table (cycle time, availability, MTTR, energy rates) from an aggregate."""
+    seconds = agg.pivot_table(index="MachineName", columns="ReasonCode", values="ProcessTime_s",
+                              aggfunc="sum", fill_value=0.0)
+    seconds.columns.name = None
+    reasons = agg["ReasonCode"]
+
+    # Running times & average cycle time
+    running = agg[reasons.isin(RUNNING_CODES)]
+    running_sec = running.groupby("MachineName")["ProcessTime_s"].sum()
+    avg_time_per_part = (running_sec/produced_parts).rename("Avg_Time_per_part_s")
+
+    # Availability
+    available = sum(seconds[code] for code in AVAILABLE_CODES if code in seconds.columns)
+    availability_pct = (available / seconds.sum(axis=1) * 100).rename("Availability_%")
+
+    # MTTR
+    stopped = agg[reasons == "Stopped"].groupby("MachineName")[["ProcessTime_s", "TimedEvents"]].sum()
+    mttr = (stopped["ProcessTime_s"] / stopped["TimedEvents"]).reindex(seconds.index).rename("MTTR_s")
+
+    # if a machine never stopped but is 100% available, assign an MTTR of 1 s
+    mttr[mttr.isna() & (availability_pct == 100)] = 1.0
+
+    # Energy rates (kJ per second)
+    keep = agg[reasons.isin(list(ENERGY_CATEGORIES))]
+    energy = (keep.assign(Category=keep["ReasonCode"].map(ENERGY_CATEGORIES))
+              .groupby(["MachineName", "Category"])[["EnergyConsumption", "ProcessTime_s"]].sum())
+    energy["kJ_per_s"] = energy["EnergyConsumption"] / energy["ProcessTime_s"]
+    energy = energy["kJ_per_s"].unstack(fill_value=0)
+
+    # Merge & round
+    final = (pd.concat([avg_time_per_part, availability_pct, mttr, energy], axis=1).reset_index().rename(columns={"index": "MachineName"}))
+
+    # round all numeric columns to two decimal places
+    numeric_cols = final.select_dtypes(include="number").columns
+    final[numeric_cols] = final[numeric_cols].round(2)
+    return final
+
+def compute(df):
+    """
+    Stations table of an event log.
+
+    df is either a preprocessed DataFrame or an iterable of preprocessed
+    chunks (see eventlog.iter_chunks); chunks are reduced to partial
+    aggregates one at a time, so only the aggregate and the set of part IDs
+    are kept in memory.
+    """
+    if isinstance(df, pd.DataFrame):
+        return stations_table(aggregate(df), df["ID"].nunique())
+    agg = None
+    part_ids = set()
+    for chunk in df:
+        partial = aggregate(chunk)
+        agg = partial if agg is None else combine([agg, partial])
+        part_ids.update(chunk["ID"].unique())
+    if agg is None:
+        raise ValueError("Event log contains no rows")
+    return stations_table(agg, len(part_ids))
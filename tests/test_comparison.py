@@ -0,0 +1,50 @@
+import math
+import pytest
+from helpers.comparison import common_seeds, paired_comparison, t_quantile
+
+def document(model, kpis_by_seed):
+    """Result document with one replication per {seed: (throughput, wip, energy_per_part)}."""
+    return {"model": model, "replications": [
+        {"seed": seed, "overall": {"throughput": th, "wip": wip}, "energy_per_part": epp}
+        for seed, (th, wip, epp) in kpis_by_seed.items()]}
+
+BASELINE = document("original", {11: (60.0, 5.0, 0.10), 12: (64.0, 5.5, 0.11), 13: (58.0, 4.8, 0.12),
+                                 14: (61.0, 5.1, 0.10)})
+
+def test_t_quantile():
+    assert t_quantile(0.975, 1) == pytest.approx(12.706, abs=1e-3)
+    assert t_quantile(0.975, 9) == pytest.approx(2.262, abs=1e-3)
+    assert t_quantile(0.975, 1000) == pytest.approx(1.962, abs=1e-3)
+
+def test_differences_are_paired_by_seed():
+    # the candidate is +2 parts/h on every seed, in another replication order and with an extra seed
+    candidate = document("adapted", {14: (63.0, 5.1, 0.10), 12: (66.0, 5.5, 0.11), 99: (10.0, 1.0, 1.0),
+                                     11: (62.0, 5.0, 0.10), 13: (60.0, 4.8, 0.12)})
+    assert common_seeds(BASELINE, candidate) == [11, 12, 13, 14]
+    comparison = paired_comparison(BASELINE, candidate)
+    throughput = comparison["throughput"]
+    assert throughput["mean_diff"] == pytest.approx(2.0)
+    assert throughput["half_width"] == pytest.approx(0.0, abs=1e-12)
+    assert throughput["significant"] and throughput["n"] == 4
+    assert throughput["pct"] == pytest.approx(2.0 / 60.75 * 100.0)
+    assert comparison["wip"]["mean_diff"] == pytest.approx(0.0) and not comparison["wip"]["significant"]
+
+def test_interval_is_the_t_interval_of_the_differences():
+    candidate = document("adapted", {11: (61.0, 5.0, 0.10), 12: (63.0, 5.5, 0.11), 13: (60.0, 4.8, 0.12),
+                                     14: (61.5, 5.1, 0.10)})
+    diffs = [1.0, -1.0, 2.0, 0.5]
+    mean = sum(diffs) / 4
+    sd = math.sqrt(sum((d - mean) ** 2 for d in diffs) / 3)
+    half_width = t_quantile(0.975, 3) * sd / 2
+    throughput = paired_comparison(BASELINE, candidate)["throughput"]
+    assert throughput["mean_diff"] == pytest.approx(mean)
+    assert (throughput["ci_low"], throughput["ci_high"]) == pytest.approx((mean - half_width, mean + half_width))
+    assert not throughput["significant"]
+    assert paired_comparison(BASELINE, candidate, confidence=0.5)["throughput"]["half_width"] < half_width
+
+def test_fewer_than_two_common_seeds_is_an_error():
+    with pytest.raises(ValueError):
+        paired_comparison(BASELINE, document("adapted", {11: (61.0, 5.0, 0.1), 20: (1.0, 1.0, 1.0)}))
+    # documents parsed from the printed text have no replications
+    with pytest.raises(ValueError):
+        paired_comparison(BASELINE, {"model": "text", "replications": []})
@@ -0,0 +1,122 @@
+import random
+import pytest
+import simpy
+from blueprint.des_lib import SEC_PER_DAY, SEC_PER_WEEK, DelayBuffer, ShiftCalendar, Splitter
+
+HOUR = 3600
+
+def old_production_wait_time(now):
+    # the stop-window function of the original blueprint: Mon-Fri 16:00-24:00
+    day = int((now // SEC_PER_DAY) % 7)
+    time_of_day = now % SEC_PER_DAY
+    if day in (0, 1, 2, 3, 4) and 16 * HOUR <= time_of_day < 24 * HOUR:
+        return max(0.0, 24 * HOUR - time_of_day)
+    return 0.0
+
+def old_weekend_wait_time(now):
+    # the same style, hand-coded for "Fri 17:00-Sat 07:00" and "Sat 17:00-Sun 07:00"
+    day = int((now // SEC_PER_DAY) % 7)
+    time_of_day = now % SEC_PER_DAY
+    if day in (4, 5) and time_of_day >= 17 * HOUR:
+        return SEC_PER_DAY - time_of_day + 7 * HOUR
+    if day in (5, 6) and time_of_day < 7 * HOUR:
+        return 7 * HOUR - time_of_day
+    return 0.0
+
+def old_night_wait_time(now):
+    # a window across the end of the week: Sun 22:00 to Mon 06:00
+    day = int((now // SEC_PER_DAY) % 7)
+    time_of_day = now % SEC_PER_DAY
+    if day == 6 and time_of_day >= 22 * HOUR:
+        return SEC_PER_DAY - time_of_day + 6 * HOUR
+    if day == 0 and time_of_day < 6 * HOUR:
+        return 6 * HOUR - time_of_day
+    return 0.0
+
+def sample_times(weeks=3):
+    rng = random.Random(0)
+    grid = range(0, weeks * SEC_PER_WEEK, 15 * 60)
+    return list(grid) + [rng.uniform(0, weeks * SEC_PER_WEEK) for _ in range(2000)]
+
+@pytest.mark.parametrize("windows, old", [
+    (["Mon-Fri 16:00-24:00"], old_production_wait_time),
+    (["Fri 17:00-Sat 07:00", "Sat 17:00-Sun 07:00"], old_weekend_wait_time),
+    (["Sun 22:00-Mon 06:00"], old_night_wait_time),
+])
+def test_wait_time_matches_old_stop_window_function(windows, old):
+    calendar = ShiftCalendar(windows)
+    for now in sample_times():
+        assert calendar.wait_time(now) == pytest.approx(old(now), abs=1e-6), now
+
+def test_next_close_is_the_first_closed_minute():
+    calendar = ShiftCalendar(["Mon-Fri 16:00-24:00", "Sat 10:00-12:00"])
+    minutes = range(0, 2 * SEC_PER_WEEK, 60)
+    closed = [t for t in minutes if calendar.wait_time(t) > 0]
+    for now in range(0, SEC_PER_WEEK, 7 * 60):
+        assert calendar.next_close(now) == next(t for t in closed if t >= now)
+
+def test_calendar_edge_cases():
+    assert ShiftCalendar([]).wait_time(12345) == 0.0
+    assert ShiftCalendar([]).next_close(12345) == float("inf")
+    assert ShiftCalendar(["Mon-Sun 00:00-24:00"]).wait_time(0) == float("inf")
+    with pytest.raises(ValueError):
+        ShiftCalendar(["Funday 08:00-09:00"])
+
+def test_delay_buffer_counts_parts_in_transit_against_its_capacity():
+    env = simpy.Environment()
+    buffer = DelayBuffer(env, cap=2, delay=10)
+    entered = {}
+
+    def producer(part):
+        # the put fires once the part has passed the transit delay
+        yield buffer.put(part)
+        entered[part] = env.now
+
+    def consumer():
+        yield env.timeout(15)
+        assert (yield buffer.get()) == 0
+
+    for part in range(3):
+        env.process(producer(part))
+    env.process(consumer())
+    env.run(until=5)
+    # two parts in transit fill the buffer, the third producer waits
+    assert buffer.in_transit_count() == 2 and buffer.free_capacity() == 0 and not buffer.items
+    env.run(until=12)
+    assert buffer.items == [0, 1] and buffer.in_transit_count() == 0 and buffer.free_capacity() == 0
+    assert entered == {0: 10, 1: 10}
+    env.run(until=20)
+    # taking part 0 at t=15 freed a slot, so part 2 started its transit then
+    assert buffer.items == [1] and buffer.in_transit_count() == 1
+    env.run(until=30)
+    assert entered[2] == 25 and buffer.items == [1, 2]
+
+def test_delay_buffer_get_waits_for_the_transit_and_can_be_cancelled():
+    env = simpy.Environment()
+    buffer = DelayBuffer(env, cap=1, delay=5)
+    cancelled = buffer.get()
+    cancelled.cancel()
+    received = []
+
+    def consumer():
+        part = yield buffer.get()
+        received.append((env.now, part))
+
+    env.process(consumer())
+    buffer.put("a")
+    env.run()
+    assert received == [(5, "a")]
+    assert not cancelled.triggered and buffer.free_capacity() == 1
+
+def test_round_robin_turn_passes_the_output_that_took_the_part():
+    env = simpy.Environment()
+    source = simpy.Store(env)
+    outputs = [simpy.Store(env, capacity=1), simpy.Store(env), simpy.Store(env)]
+    outputs[0].put("blocker")
+    splitter = Splitter(env, "split", source, outputs)
+    for part in range(4):
+        source.put(part)
+    env.run()
+    # output 0 is full for part 0, which goes to output 1; the turn then moves on to output 2
+    assert [list(out.items) for out in outputs] == [["blocker"], [0, 2], [1, 3]]
+    assert splitter.routed == [0, 2, 2]
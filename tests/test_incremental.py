@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+from processmining import eventlog, metrics
+from processmining.incremental import IncrementalMetrics
+
+MACHINES = ["Loading robot", "Conveyor belt", "Washing machine", "Presses cell 1"]
+
+def event_log(parts, start=0, seed=0):
+    """Rows of parts flowing through the machines one after another, in the input data contract."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for part in range(start, start + parts):
+        t = pd.Timestamp("2024-01-01") + pd.Timedelta(minutes=3 * part)
+        for machine in MACHINES:
+            # some parts leave two events with the same EndTime, which separate_ties shifts apart
+            end = t + pd.Timedelta(seconds=int(rng.integers(30, 300)) if rng.random() > 0.05 else 0)
+            rows.append((f"p{part}", machine, t, end, rng.choice(["Working", "Idle"]), round(rng.random() * 10, 3)))
+            t = end
+    df = pd.DataFrame(rows, columns=eventlog.METRICS_COLUMNS)
+    for col in eventlog.DATE_COLUMNS:
+        df[col] = df[col].dt.strftime(eventlog.TIMESTAMP_FORMAT)
+    return df
+
+def full(path):
+    df = eventlog.preprocess(eventlog.load(path))
+    return metrics.compute(df), eventlog.to_sequence_text(df, counts=True)
+
+def test_appended_rows_give_the_same_metrics_as_a_full_recompute(tmp_path):
+    path = tmp_path / "log.csv"
+    df = event_log(3000)
+    cuts = [0, 1000, 1001, 2500, len(df)]
+    for start, end in zip(cuts, cuts[1:]):
+        df.iloc[start:end].to_csv(path, mode="a", header=start == 0, index=False)
+        incremental = IncrementalMetrics(path, chunksize=700)
+        assert incremental.update() == end - start
+        table, text = full(path)
+        pd.testing.assert_frame_equal(incremental.stations_table(), table)
+        assert incremental.sequence_text(counts=True) == text
+
+def test_a_partial_last_line_is_read_on_the_next_update(tmp_path):
+    path = tmp_path / "log.csv"
+    csv = event_log(50).to_csv(index=False)
+    cut = csv.rindex("\n", 0, len(csv) - 1) + 10
+    path.write_text(csv[:cut], encoding="utf-8")
+    incremental = IncrementalMetrics(path)
+    rows = incremental.update()
+    path.write_text(csv, encoding="utf-8")
+    assert rows + IncrementalMetrics(path).update() == 50 * len(MACHINES)
+    pd.testing.assert_frame_equal(IncrementalMetrics(path).stations_table(), full(path)[0])
+
+def test_state_only_keeps_the_tie_window(tmp_path):
+    path = tmp_path / "log.csv"
+    event_log(2000).to_csv(path, index=False)
+    incremental = IncrementalMetrics(path)
+    incremental.update()
+    state = incremental.state
+    assert state["parts"] == 2000 and "part_ids" not in state
+    ends = pd.to_datetime([end for _, _, end in state["recent_events"]])
+    assert ends.max() - ends.min() <= incremental.tie_window
+    # a day of parts at one every 3 minutes, not the whole history
+    assert len({case for case, _, _ in state["recent_events"]}) < 600
+
+def test_a_replaced_log_rebuilds_the_state(tmp_path):
+    path = tmp_path / "log.csv"
+    event_log(300).to_csv(path, index=False)
+    IncrementalMetrics(path).update()
+    event_log(200, seed=1).to_csv(path, index=False)
+    incremental = IncrementalMetrics(path)
+    assert incremental.update() == 200 * len(MACHINES)
+    pd.testing.assert_frame_equal(incremental.stations_table(), full(path)[0])
+
+def test_empty_log_has_no_stations_table(tmp_path):
+    path = tmp_path / "log.csv"
+    path.write_text(",".join(eventlog.METRICS_COLUMNS) + "\n", encoding="utf-8")
+    incremental = IncrementalMetrics(path)
+    assert incremental.update() == 0
+    with pytest.raises(ValueError):
+        incremental.stations_table()
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+from helpers.llm_cache import CacheMiss, CachedClient, uncached
+
+class FakeClient:
+    """Stands in for the OpenAI client and numbers its answers."""
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(role="assistant", content=f"answer {len(self.requests)}")
+        return SimpleNamespace(model=kwargs["model"], choices=[SimpleNamespace(index=0, message=message)])
+
+def ask(client, content="Describe the line.", **kwargs):
+    messages = [{"role": "user", "content": content}]
+    return client.chat.completions.create(model="gpt-5.1", messages=messages, **kwargs).choices[0].message.content
+
+def test_readwrite_calls_the_api_once_per_request(tmp_path):
+    raw = FakeClient()
+    client = CachedClient(raw, tmp_path)
+    assert ask(client) == "answer 1"
+    assert ask(client) == "answer 1"
+    assert ask(client, response_format={"type": "json_object"}) == "answer 2"
+    assert ask(client, "Another line.") == "answer 3"
+    assert len(raw.requests) == 3
+    assert raw.requests[1]["response_format"] == {"type": "json_object"}
+
+def test_replay_answers_from_the_cache_without_a_client(tmp_path):
+    ask(CachedClient(FakeClient(), tmp_path))
+    replay = CachedClient(None, tmp_path, mode="replay")
+    assert ask(replay) == "answer 1"
+    with pytest.raises(CacheMiss):
+        ask(replay, "Never asked.")
+
+def test_off_always_calls_the_api_and_stores_nothing(tmp_path):
+    raw = FakeClient()
+    client = CachedClient(raw, tmp_path, mode="off")
+    assert [ask(client), ask(client)] == ["answer 1", "answer 2"]
+    with pytest.raises(CacheMiss):
+        ask(CachedClient(None, tmp_path, mode="replay"))
+
+def test_unknown_mode_and_missing_client(tmp_path):
+    with pytest.raises(ValueError):
+        CachedClient(FakeClient(), tmp_path, mode="write")
+    with pytest.raises(RuntimeError):
+        ask(CachedClient(None, tmp_path))
+
+def test_uncached_returns_the_wrapped_client(tmp_path):
+    raw = FakeClient()
+    assert uncached(CachedClient(raw, tmp_path)) is raw
+    assert uncached(raw) is raw
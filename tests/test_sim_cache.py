@@ -0,0 +1,69 @@
+import shutil
+from pathlib import Path
+import pytest
+from helpers import sim_cache
+from helpers.cache import DiskCache
+from helpers.sim_cache import SimulationCache, normalize_source, run_settings
+
+MODEL = """import simpy
+SIM_TIME = 3600 * 24 * 30
+REPLICATIONS = 10
+
+def run_simulation(seed):
+    return {"seed": seed, "capacity": 2}
+"""
+LIBRARY_MODEL = "from blueprint.des_lib import run_and_report\n" + MODEL
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """A copy of blueprint/ that the cache keys hash instead of the real one."""
+    directory = tmp_path / "blueprint"
+    shutil.copytree(Path(sim_cache.__file__).resolve().parents[1] / "blueprint", directory,
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    monkeypatch.setattr(sim_cache, "_LIBRARY_DIR", directory)
+    return directory
+
+@pytest.fixture
+def cache(tmp_path):
+    return SimulationCache(tmp_path / "cache")
+
+def test_comments_and_spacing_keep_the_key(cache):
+    edited = MODEL.replace("REPLICATIONS = 10", "REPLICATIONS  =  10   # runs\n\n")
+    assert cache.key(edited) == cache.key(MODEL)
+
+@pytest.mark.parametrize("old, new", [("10", "12"), ("* 30", "* 7"), ('"capacity": 2', '"capacity": 3')])
+def test_changed_code_or_settings_change_the_key(cache, old, new):
+    assert cache.key(MODEL.replace(old, new)) != cache.key(MODEL)
+
+def test_environment_changes_the_key(cache):
+    assert cache.key(MODEL, {"DES_SEEDS": "11,12"}) != cache.key(MODEL, {"DES_SEEDS": "11,13"})
+
+def test_run_settings_evaluate_arithmetic():
+    assert run_settings(MODEL) == {"SIM_TIME": 3600 * 24 * 30, "REPLICATIONS": 10}
+
+def test_editing_the_library_changes_the_key_of_importing_models(cache, library):
+    before = cache.key(LIBRARY_MODEL)
+    with open(library / "des_lib.py", "a", encoding="utf-8") as f:
+        f.write("\n# changed\n")
+    assert cache.key(LIBRARY_MODEL) != before
+    before = cache.key(LIBRARY_MODEL)
+    (library / "extra.py").write_text("X = 1\n", encoding="utf-8")
+    assert cache.key(LIBRARY_MODEL) != before
+
+def test_self_contained_models_ignore_the_library(cache, library):
+    before = cache.key(MODEL)
+    (library / "des_lib.py").write_text("", encoding="utf-8")
+    assert cache.key(MODEL) == before == DiskCache.key(normalize_source(MODEL), run_settings(MODEL), {})
+
+def test_run_is_served_from_the_cache(cache, monkeypatch):
+    calls = []
+
+    def run_model(code, timeout=300, env=None):
+        calls.append(env)
+        return "stdout", {"runs": len(calls)}
+
+    monkeypatch.setattr(sim_cache, "run_model", run_model)
+    assert cache.run(MODEL) == ("stdout", {"runs": 1})
+    assert cache.run(MODEL + "\n# comment\n") == ("stdout", {"runs": 1})
+    assert cache.run(MODEL, env={"DES_SEEDS": "1,2"}) == ("stdout", {"runs": 2})
+    assert len(calls) == 2
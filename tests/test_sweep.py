@@ -0,0 +1,48 @@
+import pytest
+from blueprint import topology
+from helpers.sweep import apply_parameters, model_parameters
+
+MODEL = """SIM_TIME = 3600 * 24 * 30
+REPLICATIONS = 10
+
+def run_simulation(seed):
+    buffer1 = DelayBuffer(env, cap=2, delay=10)
+    raw_input = simpy.Store(env, capacity=1000)
+    M1 = Machine(env, "M1", raw_input, buffer1, 5, 97.79, 74,
+        working_power=kwh_per_sec(1.28), waiting_power=kwh_per_sec(1.25))
+    M2 = Machine(env, "M2", input_buffer=buffer1, output_buffer=sink, process_time=20,
+        availability=95.0, mttr=100, working_power=1, waiting_power=1, capacity=2)
+    M3 = Machine(env, "Presse Ü", buffer1, sink, 7, 90.0, 80, 1, 1)
+"""
+
+def test_model_parameters():
+    parameters = model_parameters(MODEL)
+    assert {name: p.value for name, p in parameters.items()} == {
+        "SIM_TIME": 3600 * 24 * 30, "REPLICATIONS": 10, "buffer1.capacity": 2, "buffer1.delay": 10,
+        "raw_input.capacity": 1000, "M1.process_time": 5, "M1.availability": 97.79, "M1.mttr": 74,
+        "M2.process_time": 20, "M2.availability": 95.0, "M2.mttr": 100, "M2.capacity": 2,
+        "Presse Ü.process_time": 7, "Presse Ü.availability": 90.0, "Presse Ü.mttr": 80}
+
+def test_apply_parameters_only_changes_the_given_literals():
+    changed = apply_parameters(MODEL, {"buffer1.capacity": 4, "M1.process_time": 5.5, "M2.availability": 90,
+                                       "SIM_TIME": 86400, "M2.capacity": 2.6})
+    assert changed == (MODEL.replace("cap=2", "cap=4").replace("5, 97.79", "5.5, 97.79")
+                       .replace("availability=95.0", "availability=90.0")
+                       .replace("SIM_TIME = 3600 * 24 * 30", "SIM_TIME = 86400").replace("capacity=2)", "capacity=3)"))
+    values = {name: p.value for name, p in model_parameters(changed).items()}
+    assert values["buffer1.capacity"] == 4 and values["M1.process_time"] == 5.5 and values["M2.capacity"] == 3
+    # ast columns are byte offsets, so literals after a non-ASCII name land in the right place
+    changed = apply_parameters(MODEL, {"Presse Ü.mttr": 95, "Presse Ü.process_time": 6.5})
+    assert 'Machine(env, "Presse Ü", buffer1, sink, 6.5, 90.0, 95, 1, 1)' in changed
+
+def test_apply_parameters_rejects_unknown_names():
+    with pytest.raises(KeyError):
+        apply_parameters(MODEL, {"M3.mttr": 10})
+
+def test_apply_parameters_to_a_topology_spec():
+    code = topology.to_program(topology.EXAMPLE_SPEC)
+    changed = apply_parameters(code, {"buffer1.capacity": 5, "M5.mttr": 120, "source.interarrival": 2})
+    values = {name: p.value for name, p in model_parameters(changed).items()}
+    assert values["buffer1.capacity"] == 5 and values["M5.mttr"] == 120 and values["source.interarrival"] == 2
+    spec = topology.validate(eval(changed.split("SPEC = ", 1)[1].split("\n\nif __name__")[0]))
+    assert spec["buffers"][1]["capacity"] == 5